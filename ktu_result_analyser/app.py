@@ -1,43 +1,178 @@
 import os
+import gzip
+import hashlib
+import io
 import json
+import sqlite3
+import threading
+import time
 import uuid
 from datetime import datetime
-from flask import Flask, render_template, request, send_file, redirect, url_for, flash, session
+from flask import Flask, render_template, request, send_file, redirect, url_for, flash, session, jsonify, g, abort
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import tuple_, event
+from sqlalchemy.engine import Engine
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from utils.pdf_processor import process_pdf, generate_stats
-from flask_mail import Mail, Message
+from utils.parse_cache import ParseCache
+from utils.jobs import JobQueue, QueueFull
+from utils.sgpa import CreditSchemes, parse_credit_table
+from utils.metrics import REGISTRY, HTTP_REQUEST_SECONDS, StageTimer, profile_if_slow
+from utils.locks import file_lock
+from utils.storage import StorageManager
+from utils.view_cache import ViewCache
+from utils.mailer import Outbox
 from itsdangerous import URLSafeTimedSerializer
-import pandas as pd
-import shutil
 from dotenv import load_dotenv
 
+# The analysis stack (pandas, pdfplumber/pdfium, pyarrow, openpyxl) is imported
+# inside the functions that use it, so login and the index page come up without
+# loading it. prewarm_analysis() loads it ahead of the first upload.
+
 load_dotenv()
 
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'default_secret_key_change_me')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///users.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# One pooled connection per thread that can hit the database at once: request
+# threads plus upload workers. Ignored for in-memory SQLite, which has no pool.
+if ':memory:' not in app.config['SQLALCHEMY_DATABASE_URI']:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': 30,
+        'pool_pre_ping': True,
+    }
+# Worker processes used to parse result PDF pages in parallel (1 = serial)
+app.config['PDF_WORKERS'] = int(os.getenv('PDF_WORKERS', os.cpu_count() or 1))
+# Text extraction backend for result PDFs: pdfium (fast) or pdfplumber (reference).
+# Unset uses pdfplumber; the name is checked when the parser loads
+app.config['PDF_BACKEND'] = os.getenv('PDF_BACKEND') or None
+# PDFs with at least this many pages are parsed in batches streamed to the parse
+# cache (still across PDF_WORKERS), so parsing memory stays flat however long
+# they are; the results are then read back in compact form (0 = never)
+app.config['PDF_STREAM_MIN_PAGES'] = int(os.getenv('PDF_STREAM_MIN_PAGES', 1000))
+# Import the analysis stack in the background once the first page has been served
+app.config['PREWARM_ANALYSIS'] = os.getenv('PREWARM_ANALYSIS', '').lower() in ('1', 'true', 'yes')
 
 db = SQLAlchemy(app)
+
+@event.listens_for(Engine, 'connect')
+def configure_sqlite(dbapi_connection, connection_record):
+    """
+    WAL lets readers carry on while another thread or worker process writes,
+    and busy_timeout makes concurrent writers wait instead of failing with
+    "database is locked".
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA busy_timeout=30000')
+    cursor.close()
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 login_manager.login_message = None
 
-# Mail Configuration (Example - Update with real SMTP)
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
+# Mail Configuration (python dev_smtp.py is a local stand-in for MAIL_SERVER)
+app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
+app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'true').lower() in ('1', 'true', 'yes')
+app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_SSL', '').lower() in ('1', 'true', 'yes')
 app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
+app.config['MAIL_TIMEOUT'] = float(os.getenv('MAIL_TIMEOUT', 10))
+app.config['MAIL_BATCH_SIZE'] = int(os.getenv('MAIL_BATCH_SIZE', 20))
+app.config['MAIL_MAX_RETRIES'] = int(os.getenv('MAIL_MAX_RETRIES', 5))
+app.config['MAIL_RETRY_DELAY'] = float(os.getenv('MAIL_RETRY_DELAY', 2))
+
+# Emails are queued and sent by a background thread over one reused SMTP connection
+mailer = Outbox(app.config['MAIL_SERVER'], app.config['MAIL_PORT'],
+                username=app.config['MAIL_USERNAME'], password=app.config['MAIL_PASSWORD'],
+                use_tls=app.config['MAIL_USE_TLS'], use_ssl=app.config['MAIL_USE_SSL'],
+                default_sender=app.config['MAIL_DEFAULT_SENDER'], timeout=app.config['MAIL_TIMEOUT'],
+                batch_size=app.config['MAIL_BATCH_SIZE'], max_retries=app.config['MAIL_MAX_RETRIES'],
+                retry_delay=app.config['MAIL_RETRY_DELAY'])
 
-mail = Mail(app)
 s = URLSafeTimedSerializer(app.secret_key)
 
+# Legacy JSON history, imported into the database once by init_db()
 HISTORY_FILE = os.path.join(app.config['UPLOAD_FOLDER'], 'history.json')
+app.config['HISTORY_PAGE_SIZE'] = 20
+
+# Parsed uploads keyed by file content, so repeat uploads skip parsing
+app.config['PARSE_CACHE_DIR'] = os.path.join(app.config['UPLOAD_FOLDER'], 'cache')
+app.config['PARSE_CACHE_MAX_BYTES'] = int(os.getenv('PARSE_CACHE_MAX_MB', 512)) * 1024 * 1024
+parse_cache = ParseCache(app.config['PARSE_CACHE_DIR'], app.config['PARSE_CACHE_MAX_BYTES'])
+
+# Uploads are analysed on a bounded pool of background workers
+app.config['UPLOAD_WORKERS'] = int(os.getenv('UPLOAD_WORKERS', 2))
+app.config['UPLOAD_QUEUE_DEPTH'] = int(os.getenv('UPLOAD_QUEUE_DEPTH', 8))
+# Job status files shared by every worker process, so any of them can answer a status poll
+app.config['JOB_STATUS_DIR'] = os.path.join(app.config['UPLOAD_FOLDER'], 'jobs')
+job_queue = JobQueue(app.config['UPLOAD_WORKERS'], app.config['UPLOAD_QUEUE_DEPTH'],
+                     status_dir=app.config['JOB_STATUS_DIR'])
+app.config['BATCH_MAX_FILES'] = int(os.getenv('BATCH_MAX_FILES', 50))
+
+# Lock files that serialise work on shared files across threads and worker processes
+app.config['LOCK_DIR'] = os.path.join(app.config['UPLOAD_FOLDER'], 'locks')
+
+def lock_path(name):
+    return os.path.join(app.config['LOCK_DIR'], f"{name}.lock")
+
+def upload_temp_path(user_id):
+    """Unique path for a received PDF, so concurrent uploads never share a temp file."""
+    return os.path.join(app.config['UPLOAD_FOLDER'], f"temp_{user_id}_{uuid.uuid4().hex}.pdf")
+
+# Byte quotas on stored analyses; Excel reports are evicted LRU first and rebuilt on download
+app.config['STORAGE_USER_QUOTA_BYTES'] = int(os.getenv('STORAGE_USER_QUOTA_MB', 1024)) * 1024 * 1024
+app.config['STORAGE_QUOTA_BYTES'] = int(os.getenv('STORAGE_QUOTA_MB', 10240)) * 1024 * 1024
+# The sweeper removes orphaned temp files older than TEMP_MAX_AGE seconds
+app.config['STORAGE_SWEEP_INTERVAL'] = int(os.getenv('STORAGE_SWEEP_INTERVAL', 600))
+app.config['TEMP_MAX_AGE'] = int(os.getenv('TEMP_MAX_AGE', 3600))
+storage = StorageManager(app.config['UPLOAD_FOLDER'], app.config['STORAGE_USER_QUOTA_BYTES'],
+                         app.config['STORAGE_QUOTA_BYTES'], lock_path('storage'))
+
+# Stats and rendered results pages of recently viewed analyses. VIEW_CACHE_DISK_MB
+# adds a disk tier for rendered pages, shared by worker processes (off when 0)
+app.config['VIEW_CACHE_MAX_BYTES'] = int(os.getenv('VIEW_CACHE_MAX_MB', 64)) * 1024 * 1024
+app.config['VIEW_CACHE_DISK_BYTES'] = int(os.getenv('VIEW_CACHE_DISK_MB', 0)) * 1024 * 1024
+app.config['VIEW_CACHE_DIR'] = os.path.join(app.config['UPLOAD_FOLDER'], 'view_cache')
+view_cache = ViewCache(app.config['VIEW_CACHE_MAX_BYTES'],
+                       app.config['VIEW_CACHE_DIR'] if app.config['VIEW_CACHE_DISK_BYTES'] else None,
+                       app.config['VIEW_CACHE_DISK_BYTES'])
+
+def start_storage_sweeper():
+    """Called by the server entry points; each worker process runs its own sweeper."""
+    # PDFs of jobs still queued or running in any worker are never swept, however long they wait
+    storage.start_sweeper(app.config['STORAGE_SWEEP_INTERVAL'], app.config['TEMP_MAX_AGE'], job_queue.active_files)
+
+def storage_full_response():
+    return jsonify({'error': 'Your stored analyses use up your storage quota. '
+                             'Delete some old analyses and try again.'}), 507
+
+# Subject -> credit tables for SGPA, stored per user as one JSON file per scheme
+app.config['CREDIT_SCHEME_DIR'] = os.path.join(app.config['UPLOAD_FOLDER'], 'schemes')
+
+# Upload stage timings are always served on /metrics; METRICS_LOG also prints them as JSON lines
+app.config['METRICS_LOG'] = os.getenv('METRICS_LOG', '').lower() in ('1', 'true', 'yes')
+# When set, /metrics requires an "Authorization: Bearer <token>" header
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+# Each worker process writes its metrics here every METRICS_FLUSH_INTERVAL seconds,
+# and /metrics reports the sum over all of them
+app.config['METRICS_DIR'] = os.getenv('METRICS_DIR', os.path.join(app.config['UPLOAD_FOLDER'], 'metrics'))
+app.config['METRICS_FLUSH_INTERVAL'] = int(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+def start_metrics_sharing():
+    """Called by the server entry points in each worker process, like start_storage_sweeper."""
+    REGISTRY.share(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+# Uploads slower than this many seconds leave a cProfile dump in PROFILE_DIR (off when unset)
+app.config['PROFILE_SLOW_UPLOADS'] = float(os.getenv('PROFILE_SLOW_UPLOADS')) if os.getenv('PROFILE_SLOW_UPLOADS') else None
+app.config['PROFILE_DIR'] = os.path.join(app.config['UPLOAD_FOLDER'], 'profiles')
 
 # User Model
 class User(UserMixin, db.Model):
@@ -50,74 +185,689 @@ class User(UserMixin, db.Model):
 def load_user(user_id):
     return User.query.get(int(user_id))
 
+# History Model
+class HistoryEntry(db.Model):
+    __tablename__ = 'history'
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    excel_filename = db.Column(db.String(255), nullable=False, index=True)
+    date = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now().replace(microsecond=0))
+
+    # Per-user listings are always newest first
+    __table_args__ = (db.Index('ix_history_user_date', 'user_id', 'date'),)
+
+# Per-analysis aggregates behind the trend queries, so a query never reloads raw results
+class SubjectAggregate(db.Model):
+    __tablename__ = 'subject_aggregate'
+    id = db.Column(db.Integer, primary_key=True)
+    history_id = db.Column(db.String(36), db.ForeignKey('history.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    dept = db.Column(db.String(8), nullable=False)
+    year = db.Column(db.String(8), nullable=False)
+    subject = db.Column(db.String(16), nullable=False)
+    passed = db.Column(db.Integer, nullable=False)
+    failed = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index('ix_subject_aggregate_filter', 'user_id', 'dept', 'year', 'subject'),)
+
+class StudentAggregate(db.Model):
+    __tablename__ = 'student_aggregate'
+    id = db.Column(db.Integer, primary_key=True)
+    history_id = db.Column(db.String(36), db.ForeignKey('history.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    register_no = db.Column(db.String(16), nullable=False)
+    dept = db.Column(db.String(8), nullable=False)
+    year = db.Column(db.String(8), nullable=False)
+    passed = db.Column(db.Integer, nullable=False)
+    failed = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index('ix_student_aggregate_reg', 'user_id', 'register_no'),)
+
 # History Management Helpers
-def load_history():
+def import_history_file():
+    """
+    One-time import of the old uploads/history.json into the history table.
+    The file is renamed afterwards so the import never runs twice.
+    """
     if not os.path.exists(HISTORY_FILE):
-        return []
+        return
     try:
         with open(HISTORY_FILE, 'r') as f:
             all_history = json.load(f)
-            # Filter history by current user if logged in
-            if current_user.is_authenticated:
-                return [h for h in all_history if h.get('user_id') == current_user.id]
-            return []
-    except:
-        return []
+    except Exception as e:
+        print(f"Error reading {HISTORY_FILE}: {e}")
+        return
+
+    existing = {row.id for row in db.session.query(HistoryEntry.id)}
+    for h in all_history:
+        if h.get('id') in existing or h.get('user_id') is None:
+            continue
+        db.session.add(HistoryEntry(
+            id=h['id'],
+            user_id=h['user_id'],
+            filename=h['filename'],
+            excel_filename=h['excel_filename'],
+            date=datetime.strptime(h['date'], "%Y-%m-%d %H:%M:%S")
+        ))
+    db.session.commit()
+    os.replace(HISTORY_FILE, HISTORY_FILE + '.imported')
+
+def init_db():
+    """
+    Creates missing tables and imports legacy history. Call inside an app
+    context. Safe to run from several worker processes starting at once.
+    """
+    with file_lock(lock_path('init_db')):
+        db.create_all()
+        import_history_file()
+
+def load_history(user_id=None, page=1, per_page=None):
+    """Returns one page of the user's history, newest first."""
+    if user_id is None:
+        user_id = current_user.id
+    query = HistoryEntry.query.filter_by(user_id=user_id).order_by(HistoryEntry.date.desc())
+    return query.paginate(page=page, per_page=per_page or app.config['HISTORY_PAGE_SIZE'], error_out=False)
+
+def get_history_entry(entry_id, user_id=None):
+    if user_id is None:
+        user_id = current_user.id
+    return HistoryEntry.query.filter_by(id=entry_id, user_id=user_id).first()
+
+def add_to_history(filename, excel_filename, user_id=None):
+    if user_id is None:
+        user_id = current_user.id
+    entry = HistoryEntry(user_id=user_id, filename=filename, excel_filename=excel_filename)
+    db.session.add(entry)
+    db.session.commit()
+    return entry
+
+def delete_from_history(entry_id):
+    from utils.analysis_store import delete_analysis
+    entry = get_history_entry(entry_id)
+    
+    if entry:
+        delete_analysis(os.path.join(app.config['UPLOAD_FOLDER'], entry.excel_filename))
+        delete_aggregates([entry.id])
+        view_cache.invalidate(entry.id)
+        db.session.delete(entry)
+        db.session.commit()
+
+def save_aggregates(entry_id, user_id, df, stats):
+    """Stores the subject and student level pass/fail counts of one analysis."""
+    from utils.pdf_processor import student_counts
+    subject_rows = [
+        {'history_id': entry_id, 'user_id': user_id, 'dept': dept, 'year': str(year), 'subject': subject,
+         'passed': counts['pass'], 'failed': counts['fail'], 'total': counts['total']}
+        for dept, years in stats['dept_sub_stats'].items()
+        for year, subjects in years.items()
+        for subject, counts in subjects.items()
+    ]
+    students = student_counts(df)
+    student_rows = [
+        {'history_id': entry_id, 'user_id': user_id, 'register_no': reg_no, 'dept': dept, 'year': str(year),
+         'passed': passed, 'failed': failed, 'total': total}
+        for reg_no, dept, year, passed, failed, total in zip(
+            students['Register No'].tolist(), students['Dept'].tolist(), students['Year'].tolist(),
+            students['passed'].tolist(), students['failed'].tolist(), students['total'].tolist())
+    ]
+    if subject_rows:
+        db.session.execute(db.insert(SubjectAggregate), subject_rows)
+    if student_rows:
+        db.session.execute(db.insert(StudentAggregate), student_rows)
+    db.session.commit()
+
+def delete_aggregates(entry_ids):
+    SubjectAggregate.query.filter(SubjectAggregate.history_id.in_(entry_ids)).delete(synchronize_session=False)
+    StudentAggregate.query.filter(StudentAggregate.history_id.in_(entry_ids)).delete(synchronize_session=False)
+
+def update_aggregates(entry_id, user_id, df, stats, changed):
+    """
+    Rewrites only the aggregate rows an update touched: the Dept/Year/Subject
+    cells and the students in changed (as returned by upsert_results).
+    An entry without any aggregates yet (imported, or stored before the
+    aggregate tables) gets them for the whole analysis instead, as a partial
+    set would stop backfill_aggregates from ever completing it.
+    """
+    from utils.pdf_processor import student_counts
+    if not db.session.query(db.exists().where(SubjectAggregate.history_id == entry_id)).scalar():
+        delete_aggregates([entry_id])
+        save_aggregates(entry_id, user_id, df, stats)
+        return
+    cells = set(zip(changed['Dept'], changed['Year'], changed['Subject']))
+    reg_nos = set(changed['Register No'])
+    SubjectAggregate.query.filter(
+        SubjectAggregate.history_id == entry_id,
+        tuple_(SubjectAggregate.dept, SubjectAggregate.year, SubjectAggregate.subject).in_(cells)
+    ).delete(synchronize_session=False)
+    StudentAggregate.query.filter(
+        StudentAggregate.history_id == entry_id, StudentAggregate.register_no.in_(reg_nos)
+    ).delete(synchronize_session=False)
+    
+    subject_rows = [
+        {'history_id': entry_id, 'user_id': user_id, 'dept': dept, 'year': year, 'subject': subject,
+         'passed': counts['pass'], 'failed': counts['fail'], 'total': counts['total']}
+        for dept, year, subject in cells
+        for counts in [stats['dept_sub_stats'][dept][year][subject]]
+    ]
+    students = student_counts(df[df['Register No'].isin(reg_nos)])
+    student_rows = [
+        {'history_id': entry_id, 'user_id': user_id, 'register_no': reg_no, 'dept': dept, 'year': str(year),
+         'passed': passed, 'failed': failed, 'total': total}
+        for reg_no, dept, year, passed, failed, total in zip(
+            students['Register No'].tolist(), students['Dept'].tolist(), students['Year'].tolist(),
+            students['passed'].tolist(), students['failed'].tolist(), students['total'].tolist())
+    ]
+    if subject_rows:
+        db.session.execute(db.insert(SubjectAggregate), subject_rows)
+    if student_rows:
+        db.session.execute(db.insert(StudentAggregate), student_rows)
+    db.session.commit()
+
+def backfill_aggregates(user_id):
+    """Builds aggregates for analyses stored before the aggregate tables existed."""
+    from utils.analysis_store import load_analysis
+    missing = HistoryEntry.query.filter_by(user_id=user_id).filter(
+        ~db.exists().where(SubjectAggregate.history_id == HistoryEntry.id)
+    ).all()
+    for entry in missing:
+        analysis = load_analysis(os.path.join(app.config['UPLOAD_FOLDER'], entry.excel_filename))
+        if analysis is not None:
+            save_aggregates(entry.id, user_id, *analysis)
+
+def user_schemes(user_id=None):
+    if user_id is None:
+        user_id = current_user.id
+    return CreditSchemes(os.path.join(app.config['CREDIT_SCHEME_DIR'], str(user_id)))
+
+def requested_scheme(name):
+    """(name, credits) for one of the current user's credit schemes; aborts with 400 if unknown."""
+    if not name:
+        return None
+    try:
+        credits = user_schemes().get(name)
+    except ValueError:
+        credits = None
+    if credits is None:
+        abort(json_response({'error': f"Unknown credit scheme '{name}'"}, 400))
+    return name, credits
 
-def save_history(history):
-    all_history = []
-    if os.path.exists(HISTORY_FILE):
+analysis_stack_lock = threading.Lock()
+analysis_stack_loaded = False
+prewarm_thread = None
+
+def load_analysis_stack():
+    """
+    Imports the PDF parsing and analysis modules, checks PDF_BACKEND and drops
+    parse cache entries of other parser versions. Only the first call does any
+    work; uploads call it before touching the parse cache.
+    """
+    global analysis_stack_loaded
+    with analysis_stack_lock:
+        if analysis_stack_loaded:
+            return
+        import pyarrow.feather  # read lazily by pandas on the first stored analysis
+        import utils.analysis_store, utils.excel_export
+        from utils.pdf_processor import BACKENDS
+        backend = app.config['PDF_BACKEND']
+        if backend is not None and backend not in BACKENDS:
+            raise ValueError(f"PDF_BACKEND must be one of {', '.join(BACKENDS)}, got '{backend}'")
+        parse_cache.invalidate()
+        analysis_stack_loaded = True
+
+def prewarm_analysis():
+    """Runs load_analysis_stack() on a background thread, once per process."""
+    global prewarm_thread
+    if prewarm_thread is not None:
+        return
+
+    def prewarm():
+        start = time.perf_counter()
         try:
-            with open(HISTORY_FILE, 'r') as f:
-                all_history = json.load(f)
-        except:
-            pass
+            load_analysis_stack()
+            print(f"Analysis modules loaded in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            print(f"Error prewarming analysis modules: {e}")
+
+    prewarm_thread = threading.Thread(target=prewarm, name='prewarm', daemon=True)
+    prewarm_thread.start()
+
+def parse_upload(filepath, progress=None, workers=None, timer=None):
+    """
+    Returns (df, stats) for a saved PDF, from the parse cache when possible.
+    Long PDFs (PDF_STREAM_MIN_PAGES) are streamed into the cache batch by
+    batch rather than parsed into one DataFrame.
+    """
+    from utils.pdf_processor import PageTexts, iter_result_batches, process_pdf
+    load_analysis_stack()
+    timer = timer or StageTimer()
+    with timer.stage('cache_lookup'):
+        cache_key = ParseCache.key_for(filepath, app.config['PDF_BACKEND'])
+        cached = parse_cache.get(cache_key)
+    if cached:
+        return cached
     
-    user_id = current_user.id if current_user.is_authenticated else None
-    rest_history = [h for h in all_history if h.get('user_id') != user_id]
+    timings = {}
+    workers = workers or app.config['PDF_WORKERS']
+    start = time.perf_counter()
+    stream_pages = app.config['PDF_STREAM_MIN_PAGES']
+    try:
+        # Opened once for both the page count and the parse
+        pages = PageTexts(filepath, app.config['PDF_BACKEND'])
+    except Exception as e:
+        print(f"Error processing PDF: {e}")
+        return None, None
+    with pages:
+        if stream_pages and len(pages) >= stream_pages:
+            # Written straight into the cache entry and read back in compact form.
+            # Slices parsed in parallel go to the upload folder, whose sweeper
+            # removes any a crashed parse leaves behind
+            try:
+                batches = iter_result_batches(pages, progress=progress, timings=timings, workers=workers,
+                                              work_dir=app.config['UPLOAD_FOLDER'])
+                df, stats = parse_cache.put_batches(cache_key, batches) or (None, None)
+            except Exception as e:
+                print(f"Error processing PDF: {e}")
+                df, stats = None, None
+            timer.parse_seconds = time.perf_counter() - start
+            timer.add_all(timings)
+            return df, stats
+
+        df, stats = process_pdf(pages, workers=workers, progress=progress, timings=timings)
+    timer.parse_seconds = time.perf_counter() - start
+    timer.add_all(timings)
     
-    for h in history:
-        h['user_id'] = user_id
-        
-    all_history = history + rest_history
-    
-    with open(HISTORY_FILE, 'w') as f:
-        json.dump(all_history, f, indent=4)
-
-def add_to_history(filename, excel_filename):
-    history = load_history()
-    entry = {
-        'id': str(uuid.uuid4()),
-        'user_id': current_user.id,
-        'filename': filename,
-        'excel_filename': excel_filename,
-        'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
-    history.insert(0, entry)
-    save_history(history)
-    return entry
+    if df is not None:
+        with timer.stage('cache_store'):
+            parse_cache.put(cache_key, df, stats)
+    return df, stats
 
-def delete_from_history(entry_id):
-    all_history = []
-    if os.path.exists(HISTORY_FILE):
+def store_analysis(job, user_id, filename, df, stats, timer, scheme=None):
+    """
+    Writes the Excel report and the stored analysis for parsed results and
+    records them in the user's history. scheme is an optional (name, credits)
+    credit table; when given the report gets SGPA sheets.
+    Returns the new history entry id.
+    """
+    from utils.analysis_store import save_analysis
+    from utils.excel_export import write_analysis_workbook
+    from utils.sgpa import compute_sgpa, sgpa_distribution
+    sgpa = None
+    if scheme:
+        with timer.stage('sgpa'):
+            sgpa_df, _ = compute_sgpa(df, scheme[1])
+            sgpa = (sgpa_df, sgpa_distribution(sgpa_df))
+        stats['sgpa_scheme'] = scheme[0]
+    
+    job.set_stage('exporting')
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    excel_filename = f"user_{user_id}_analysis_{timestamp}_{uuid.uuid4().hex[:8]}.xlsx"
+    excel_path = os.path.join(app.config['UPLOAD_FOLDER'], excel_filename)
+    
+    with timer.stage('excel_export'):
+        tmp = f"{excel_path}.{uuid.uuid4().hex}.tmp"
         try:
-            with open(HISTORY_FILE, 'r') as f:
-                all_history = json.load(f)
-        except:
-            pass
-            
-    entry = next((item for item in all_history if item['id'] == entry_id and item.get('user_id') == current_user.id), None)
+            write_analysis_workbook(df, stats, tmp, sgpa)
+            os.replace(tmp, excel_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
     
-    if entry:
-        excel_path = os.path.join(app.config['UPLOAD_FOLDER'], entry['excel_filename'])
-        if os.path.exists(excel_path):
-            os.remove(excel_path)
+    job.set_stage('saving')
+    # Columnar copy of the results so /view never has to re-read the workbook
+    with timer.stage('save_analysis'):
+        save_analysis(excel_path, df, stats)
+    
+    with timer.stage('history'):
+        entry = add_to_history(filename, excel_filename, user_id)
+        save_aggregates(entry.id, user_id, df, stats)
+    
+    with timer.stage('storage'):
+        storage.enforce(keep=excel_path)
+    
+    timer.rows = len(df)
+    return entry.id
+
+def profile_path(job):
+    return os.path.join(app.config['PROFILE_DIR'], f"{job.id}.prof")
+
+def analyse_upload(job, user_id, filepath, filename, timer, scheme=None):
+    """
+    Background job: parses an uploaded PDF, writes the Excel report and the
+    stored analysis, and records it in the user's history.
+    Returns the new history entry id.
+    """
+    timer.add('queue_wait', time.time() - job.created)
+    with app.app_context(), profile_if_slow(profile_path(job), app.config['PROFILE_SLOW_UPLOADS']):
+        try:
+            job.set_stage('parsing')
+            df, stats = parse_upload(filepath, progress=job.progress, timer=timer)
+            
+            if df is None:
+                raise ValueError("Error processing PDF or no data found. Please check format.")
+            
+            timer.pages = job.pages_total or 0
+            entry_id = store_analysis(job, user_id, filename, df, stats, timer, scheme)
+            timer.finish('done', job_id=job.id, user_id=user_id)
+            return entry_id
+        except Exception:
+            timer.finish('failed', job_id=job.id, user_id=user_id)
+            raise
+        finally:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+def analyse_batch(job, user_id, uploads, timer, scheme=None):
+    """
+    Background job: parses several PDFs concurrently and stores them as one
+    merged analysis. Files that fail are listed in stats['source_files']
+    without stopping the rest of the batch.
+    Returns the new history entry id.
+    """
+    from concurrent.futures import as_completed
+    from utils.pdf_processor import process_pdf, process_pool, generate_stats, merge_results
+    timer.add('queue_wait', time.time() - job.created)
+    with app.app_context(), profile_if_slow(profile_path(job), app.config['PROFILE_SLOW_UPLOADS']):
+        try:
+            load_analysis_stack()
+            job.set_stage('parsing')
+            job.unit = 'files'
+            frames = {}
+            errors = {}
+            pending = {}
             
-        all_history = [item for item in all_history if item['id'] != entry_id]
-        with open(HISTORY_FILE, 'w') as f:
-            json.dump(all_history, f, indent=4)
+            # Cached files are served straight away; the rest go to the pool
+            with timer.stage('cache_lookup'):
+                for filepath, filename in uploads:
+                    cache_key = ParseCache.key_for(filepath, app.config['PDF_BACKEND'])
+                    cached = parse_cache.get(cache_key)
+                    if cached:
+                        frames[filepath] = cached[0]
+                    else:
+                        pending[filepath] = cache_key
+            job.progress(len(frames), len(uploads))
+            
+            if pending:
+                with timer.stage('parse'), process_pool(min(app.config['PDF_WORKERS'], len(pending))) as pool:
+                    futures = {pool.submit(process_pdf, filepath, backend=app.config['PDF_BACKEND']): filepath for filepath in pending}
+                    for future in as_completed(futures):
+                        filepath = futures[future]
+                        try:
+                            df, stats = future.result()
+                        except Exception as e:
+                            df, stats = None, None
+                            errors[filepath] = str(e)
+                        if df is None:
+                            errors.setdefault(filepath, "Error processing PDF or no data found. Please check format.")
+                        else:
+                            frames[filepath] = df
+                            parse_cache.put(pending[filepath], df, stats)
+                        job.progress(len(frames) + len(errors), len(uploads))
+            
+            if not frames:
+                raise ValueError("None of the uploaded PDFs could be processed. Please check format.")
+            
+            # Merge in upload order so the first file wins on duplicate rows
+            with timer.stage('merge'):
+                df = merge_results([frames[filepath] for filepath, _ in uploads if filepath in frames])
+            with timer.stage('generate_stats'):
+                stats = generate_stats(df)
+            stats['source_files'] = [
+                {'filename': filename, 'error': errors.get(filepath)}
+                for filepath, filename in uploads
+            ]
+            
+            names = [filename for _, filename in uploads]
+            label = names[0] if len(names) == 1 else f"{names[0]} + {len(names) - 1} more"
+            entry_id = store_analysis(job, user_id, label, df, stats, timer, scheme)
+            timer.finish('done', job_id=job.id, user_id=user_id, files=len(uploads), failed_files=len(errors))
+            return entry_id
+        except Exception:
+            timer.finish('failed', job_id=job.id, user_id=user_id, files=len(uploads))
+            raise
+        finally:
+            for filepath, _ in uploads:
+                if os.path.exists(filepath):
+                    os.remove(filepath)
+
+def analyse_update(job, user_id, entry_id, filepath, filename, timer):
+    """
+    Background job: parses a revaluation/supplementary PDF and upserts its
+    grades into an existing analysis. Stats and aggregates are adjusted for
+    the changed rows only; the Excel report is dropped and rebuilt from the
+    stored results the next time it is downloaded.
+    Returns the (unchanged) history entry id.
+    """
+    from utils.pdf_processor import upsert_results, apply_stats_delta
+    from utils.analysis_store import save_analysis, load_analysis
+    timer.add('queue_wait', time.time() - job.created)
+    with app.app_context():
+        try:
+            job.set_stage('parsing')
+            update_df, _ = parse_upload(filepath, progress=job.progress, timer=timer)
+            if update_df is None:
+                raise ValueError("Error processing PDF or no data found. Please check format.")
+            timer.pages = job.pages_total or 0
+            
+            job.set_stage('saving')
+            # Updates read, modify and rewrite the stored analysis, so they run one at a time per entry
+            with file_lock(lock_path(f"update_{entry_id}")):
+                entry = get_history_entry(entry_id, user_id)
+                excel_path = entry and os.path.join(app.config['UPLOAD_FOLDER'], entry.excel_filename)
+                analysis = entry and load_analysis(excel_path)
+                if not analysis:
+                    raise ValueError("The analysis to update no longer exists.")
+                
+                with timer.stage('upsert'):
+                    df, changed = upsert_results(analysis[0], update_df)
+                    stats = apply_stats_delta(analysis[1], changed)
+                    stats.setdefault('updates', []).append({
+                        'filename': filename,
+                        'date': datetime.now().strftime("%Y-%m-%d %H:%M"),
+                        'changed': int(changed['Old Grade'].notna().sum()),
+                        'added': int(changed['Old Grade'].isna().sum()),
+                    })
+                with timer.stage('save_analysis'):
+                    save_analysis(excel_path, df, stats)
+                with timer.stage('history'):
+                    update_aggregates(entry.id, user_id, df, stats, changed)
+                discard_workbook(entry)
+                view_cache.invalidate(entry.id)
+            
+            timer.rows = len(changed)
+            timer.finish('done', job_id=job.id, user_id=user_id, changed_rows=len(changed))
+            return entry.id
+        except Exception:
+            timer.finish('failed', job_id=job.id, user_id=user_id)
+            raise
+        finally:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+def discard_workbook(entry):
+    """Removes a stale Excel report; ensure_workbook rebuilds it."""
+    excel_path = os.path.join(app.config['UPLOAD_FOLDER'], entry.excel_filename)
+    if os.path.exists(excel_path):
+        os.remove(excel_path)
+
+def ensure_workbook(entry):
+    """
+    Path of an entry's Excel report, writing it from the stored results if it
+    is missing (dropped by an update or evicted for the storage quota).
+    None if the analysis is gone.
+    """
+    from utils.analysis_store import load_analysis
+    from utils.excel_export import write_analysis_workbook
+    from utils.sgpa import compute_sgpa, sgpa_distribution
+    excel_path = os.path.join(app.config['UPLOAD_FOLDER'], entry.excel_filename)
+    if os.path.exists(excel_path):
+        storage.touch(excel_path)
+        return excel_path
+    # Held from reading the results to replacing the report, so an update
+    # saved meanwhile cannot be overwritten by a report of the old results
+    with file_lock(lock_path(f"update_{entry.id}")):
+        if os.path.exists(excel_path):
+            # Rebuilt by a concurrent download while this one waited
+            storage.touch(excel_path)
+            return excel_path
+        analysis = load_analysis(excel_path)
+        if analysis is None:
+            return None
+        df, stats = analysis
+        sgpa = None
+        credits = stats.get('sgpa_scheme') and user_schemes(entry.user_id).get(stats['sgpa_scheme'])
+        if credits:
+            sgpa_df, _ = compute_sgpa(df, credits)
+            sgpa = (sgpa_df, sgpa_distribution(sgpa_df))
+        # Written under a temporary name so a concurrent download never sees half a file
+        tmp = f"{excel_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            write_analysis_workbook(df, stats, tmp, sgpa)
+            os.replace(tmp, excel_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    storage.enforce(keep=excel_path)
+    return excel_path
+
+def analysis_version(entry):
+    """
+    Version of an entry's stored analysis (its stats file mtime), None if it
+    has none. Analyses from before the columnar store are migrated first.
+    """
+    from utils.analysis_store import analysis_paths, load_stats
+    excel_path = os.path.join(app.config['UPLOAD_FOLDER'], entry.excel_filename)
+    stats_path = analysis_paths(excel_path)[1]
+    if not os.path.exists(stats_path) and load_stats(excel_path) is None:
+        return None
+    try:
+        return os.stat(stats_path).st_mtime_ns
+    except OSError:
+        return None
+
+def cached_stats(entry, version=None):
+    """An entry's stats through the view cache; None if the analysis is gone. Do not modify the result."""
+    from utils.analysis_store import analysis_paths, load_stats
+    version = version or analysis_version(entry)
+    if version is None:
+        return None
+    key = f"stats:{version}"
+    stats = view_cache.get(entry.id, key)
+    if stats is None:
+        excel_path = os.path.join(app.config['UPLOAD_FOLDER'], entry.excel_filename)
+        stats = load_stats(excel_path)
+        if stats is None:
+            return None
+        # Sized by the stats JSON, which tracks the dict's footprint closely enough for the bound
+        view_cache.put(entry.id, key, stats, os.path.getsize(analysis_paths(excel_path)[1]))
+    return stats
+
+def cached_analysis_frame(entry, key, build):
+    """
+    A DataFrame derived from an entry's stored results, such as one
+    Dept/Year grade pivot, through the view cache. build(df, stats) makes it
+    on a miss, which is the only time the stored results are read; it may
+    return None. key must carry the analysis version. Do not modify the result.
+    """
+    from utils.analysis_store import load_analysis
+    frame = view_cache.get(entry.id, key)
+    if frame is None:
+        analysis = load_analysis(os.path.join(app.config['UPLOAD_FOLDER'], entry.excel_filename))
+        if not analysis:
+            return None
+        frame = build(*analysis)
+        if frame is None:
+            return None
+        view_cache.put(entry.id, key, frame, int(frame.memory_usage(deep=True, index=True).sum()))
+    return frame
+
+def cached_pivot(entry, version, dept, year):
+    """The student x subject grade pivot of one Dept/Year of an analysis, None if it has no rows."""
+    from utils.excel_export import grade_pivot
+
+    def build(df, stats):
+        group_df = df[(df['Dept'] == dept) & (df['Year'] == year)]
+        return grade_pivot(group_df) if not group_df.empty else None
+
+    return cached_analysis_frame(entry, f"pivot:{version}:{dept}:{year}", build)
+
+template_versions = {}
+
+def template_version(name):
+    """Hash of a template's source, recomputed only when the file changes."""
+    path = os.path.join(app.root_path, app.template_folder, name)
+    mtime = os.stat(path).st_mtime_ns
+    cached = template_versions.get(name)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = template_versions[name] = (mtime, hashlib.sha1(f.read()).hexdigest()[:12])
+    return cached[1]
+
+def results_summary(stats):
+    """The small part of an analysis' stats the results page shell renders up front."""
+    return {
+        'total_students': stats['total_students'],
+        'total_entries': stats['total_entries'],
+        'subject_count': len(stats['subjects']),
+        'departments': stats['departments'],
+        'dept_summary': stats['dept_summary'],
+        'dept_years': {dept: list(years) for dept, years in stats['dept_sub_stats'].items()},
+        'source_files': stats.get('source_files'),
+        'sgpa_scheme': stats.get('sgpa_scheme'),
+        'updates': stats.get('updates', [])
+    }
+
+def page_args(default_per_page=50, max_per_page=500):
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', default_per_page, type=int), 1), max_per_page)
+    return page, per_page
+
+def json_response(payload, status=200):
+    """
+    JSON response that clients can revalidate with If-None-Match, gzip
+    compressed when the client accepts it and the body is worth compressing.
+    """
+    body = json.dumps(payload, separators=(',', ':'), default=str).encode()
+    response = app.response_class(body, status=status, mimetype='application/json')
+    if status != 200:
+        return response
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    compress = len(body) > 1024 and 'gzip' in request.accept_encodings
+    # The gzip and identity bodies are different representations, so they must
+    # not share a strong ETag; the suffix keeps 304s free of compression work
+    response.set_etag(hashlib.sha1(body).hexdigest() + ('-gz' if compress else ''))
+    response.make_conditional(request)
+    if response.status_code == 200 and compress:
+        response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    if 'request_started' in g:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.request_started,
+                                     endpoint=request.endpoint or 'not_found', method=request.method)
+    if app.config['PREWARM_ANALYSIS'] and prewarm_thread is None:
+        response.call_on_close(prewarm_analysis)
+    return response
 
 # Routes
+@app.route('/metrics')
+def metrics():
+    """Prometheus text format metrics, summed over every worker process (see start_metrics_sharing)."""
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return "Unauthorized", 401
+    return app.response_class(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
@@ -169,8 +919,9 @@ def logout():
 @app.route('/')
 @login_required
 def index():
-    history = load_history()
-    return render_template('index.html', history=history, user=current_user)
+    history = load_history(page=request.args.get('page', 1, type=int))
+    return render_template('index.html', history=history.items, pagination=history, schemes=user_schemes().list(),
+                           user=current_user)
 
 @app.route('/calculator')
 @login_required
@@ -188,91 +939,150 @@ def upload_file():
         return redirect(request.url)
     
     if file and file.filename.endswith('.pdf'):
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"temp_{current_user.id}_{file.filename}")
-        file.save(filepath)
-        
-        df, stats = process_pdf(filepath)
+        scheme = requested_scheme(request.form.get('scheme'))
+        if storage.over_quota(current_user.id):
+            return storage_full_response()
+        timer = StageTimer('upload', log=app.config['METRICS_LOG'])
+        filepath = upload_temp_path(current_user.id)
+        with timer.stage('save_file'):
+            file.save(filepath)
         
-        if df is None:
-            return "Error processing PDF or no data found. Please check format.", 400
-            
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        excel_filename = f"user_{current_user.id}_analysis_{timestamp}.xlsx"
-        excel_path = os.path.join(app.config['UPLOAD_FOLDER'], excel_filename)
-        
-        with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='All Results', index=False)
-            
-            if 'Dept' in df.columns and 'Year' in df.columns:
-                # 1. Generate Summary Analytics Sheet
-                summary_data = []
-                for dept in stats['departments']:
-                    for year, subjects in stats['dept_sub_stats'][dept].items():
-                        for sub_code, sub_data in subjects.items():
-                            pass_p = (sub_data['pass'] / sub_data['total'] * 100) if sub_data['total'] > 0 else 0
-                            summary_data.append({
-                                'Department': dept,
-                                'Admission Year': year,
-                                'Subject Code': sub_code,
-                                'Passed': sub_data['pass'],
-                                'Failed/Abs': sub_data['fail'],
-                                'Total': sub_data['total'],
-                                'Pass %': round(pass_p, 2)
-                            })
-                
-                if summary_data:
-                    summary_df = pd.DataFrame(summary_data)
-                    summary_df.to_excel(writer, sheet_name='Summary Analytics', index=False)
-
-                # 2. Generate Individual Dept_Year Sheets
-                groups = df[['Dept', 'Year']].drop_duplicates()
-                groups = groups.sort_values(by=['Dept', 'Year'])
-                for _, row in groups.iterrows():
-                    dept = row['Dept']
-                    year = row['Year']
-                    group_df = df[(df['Dept'] == dept) & (df['Year'] == year)]
-                    if not group_df.empty:
-                        pivot_df = group_df.pivot_table(index='Register No', columns='Subject', values='Grade', aggfunc='first')
-                        pivot_df = pivot_df.fillna('-')
-                        sheet_name = f"{dept}_{year}"[:31]
-                        pivot_df.to_excel(writer, sheet_name=sheet_name)
-        
-        add_to_history(file.filename, excel_filename)
-        
-        # Latest copy for results page
-        latest_path = os.path.join(app.config['UPLOAD_FOLDER'], f'latest_{current_user.id}.xlsx')
-        shutil.copy2(excel_path, latest_path)
-        
-        if os.path.exists(filepath):
+        try:
+            job = job_queue.submit(current_user.id, analyse_upload, current_user.id, filepath, file.filename, timer, scheme,
+                                   files=[filepath])
+        except QueueFull:
             os.remove(filepath)
+            return jsonify({'error': 'The server is busy with other analyses. Please try again shortly.'}), 503, {'Retry-After': '30'}
             
-        return render_template('results.html', stats=stats, df=df, user=current_user, filename=file.filename)
+        return jsonify({
+            'job_id': job.id,
+            'status_url': url_for('job_status', job_id=job.id),
+            'result_url': url_for('job_result', job_id=job.id)
+        }), 202
     
     return "Invalid file format. Please upload a PDF.", 400
 
+@app.route('/update/<entry_id>', methods=['POST'])
+@login_required
+def update_analysis(entry_id):
+    """Applies a revaluation/supplementary result PDF to an existing analysis in the background."""
+    entry = get_history_entry(entry_id)
+    if not entry:
+        return jsonify({'error': 'Analysis not found'}), 404
+    file = request.files.get('file')
+    if not file or not file.filename.endswith('.pdf'):
+        return jsonify({'error': 'Invalid file format. Please upload a PDF.'}), 400
+    if storage.over_quota(current_user.id):
+        return storage_full_response()
+    
+    timer = StageTimer('update', log=app.config['METRICS_LOG'])
+    filepath = upload_temp_path(current_user.id)
+    with timer.stage('save_file'):
+        file.save(filepath)
+    
+    try:
+        job = job_queue.submit(current_user.id, analyse_update, current_user.id, entry.id, filepath, file.filename, timer,
+                               files=[filepath])
+    except QueueFull:
+        os.remove(filepath)
+        return jsonify({'error': 'The server is busy with other analyses. Please try again shortly.'}), 503, {'Retry-After': '30'}
+    
+    return jsonify({
+        'job_id': job.id,
+        'status_url': url_for('job_status', job_id=job.id),
+        'result_url': url_for('job_result', job_id=job.id)
+    }), 202
+
+@app.route('/upload_batch', methods=['POST'])
+@login_required
+def upload_batch():
+    files = [f for f in request.files.getlist('files') if f.filename]
+    if not files:
+        return jsonify({'error': 'No files selected.'}), 400
+    if len(files) > app.config['BATCH_MAX_FILES']:
+        return jsonify({'error': f"A batch can have at most {app.config['BATCH_MAX_FILES']} PDFs."}), 400
+    if not all(f.filename.endswith('.pdf') for f in files):
+        return jsonify({'error': 'Invalid file format. Please upload only PDFs.'}), 400
+    
+    scheme = requested_scheme(request.form.get('scheme'))
+    if storage.over_quota(current_user.id):
+        return storage_full_response()
+    timer = StageTimer('batch', log=app.config['METRICS_LOG'])
+    uploads = []
+    with timer.stage('save_file'):
+        for file in files:
+            filepath = upload_temp_path(current_user.id)
+            file.save(filepath)
+            uploads.append((filepath, file.filename))
+    
+    try:
+        job = job_queue.submit(current_user.id, analyse_batch, current_user.id, uploads, timer, scheme,
+                               files=[filepath for filepath, _ in uploads])
+    except QueueFull:
+        for filepath, _ in uploads:
+            os.remove(filepath)
+        return jsonify({'error': 'The server is busy with other analyses. Please try again shortly.'}), 503, {'Retry-After': '30'}
+        
+    return jsonify({
+        'job_id': job.id,
+        'status_url': url_for('job_status', job_id=job.id),
+        'result_url': url_for('job_result', job_id=job.id)
+    }), 202
+
+@app.route('/status/<job_id>')
+@login_required
+def job_status(job_id):
+    job = job_queue.get(job_id, current_user.id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/result/<job_id>')
+@login_required
+def job_result(job_id):
+    job = job_queue.get(job_id, current_user.id)
+    if not job:
+        return "Job not found", 404
+    if job.state == 'failed':
+        return job.error, 400
+    if job.state != 'done':
+        return redirect(url_for('index'))
+    return redirect(url_for('view_analysis', entry_id=job.result))
+
 @app.route('/view/<entry_id>')
 @login_required
 def view_analysis(entry_id):
-    history = load_history()
-    entry = next((item for item in history if str(item['id']) == entry_id), None)
+    entry = get_history_entry(entry_id)
     
     if not entry:
         return "Analysis not found", 404
         
-    excel_path = os.path.join(app.config['UPLOAD_FOLDER'], entry['excel_filename'])
-    if not os.path.exists(excel_path):
-        return "Excel file not found", 404
-        
     try:
-        # Load the 'All Results' sheet
-        df = pd.read_excel(excel_path, sheet_name='All Results')
-        # Regenerate statistics
-        stats = generate_stats(df)
+        version = analysis_version(entry)
+        if version is None:
+            return "Analysis not found", 404
         
-        # Keep filename for display
-        filename = entry['filename']
-        
-        return render_template('results.html', stats=stats, df=df, user=current_user, filename=filename)
+        # The page only changes with the stored analysis, the template and the viewer,
+        # so its ETag is known before anything is loaded or rendered
+        key = f"view:{version}:{template_version('results.html')}:{current_user.id}"
+        etag = hashlib.sha1(f"{entry.id}:{key}".encode()).hexdigest()
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+        else:
+            html = view_cache.get(entry.id, key)
+            if html is None:
+                # Only the stats are read here; tables are fetched page by page from the JSON endpoints
+                stats = cached_stats(entry, version)
+                if stats is None:
+                    return "Analysis not found", 404
+                html = render_template('results.html', summary=results_summary(stats), entry=entry,
+                                       user=current_user, filename=entry.filename).encode()
+                view_cache.put(entry.id, key, html, len(html), persist=True)
+            response = app.response_class(html, mimetype='text/html')
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
     except Exception as e:
         print(f"Error loading historical analysis: {e}")
         return "Error loading analysis", 500
@@ -283,14 +1093,16 @@ def view_analysis(entry_id):
 def download_file(filename=None):
     if filename:
         # Security check: Does this file belong to the user?
-        history = load_history()
-        if not any(h['excel_filename'] == filename for h in history):
+        owned = HistoryEntry.query.filter_by(excel_filename=filename, user_id=current_user.id).first()
+        if not owned:
             return "Access denied", 403
-        path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        path = ensure_workbook(owned)
     else:
-        path = os.path.join(app.config['UPLOAD_FOLDER'], f'latest_{current_user.id}.xlsx')
+        # The latest report is the newest entry's own file, not a copy
+        newest = HistoryEntry.query.filter_by(user_id=current_user.id).order_by(HistoryEntry.date.desc()).first()
+        path = newest and ensure_workbook(newest)
         
-    if os.path.exists(path):
+    if path and os.path.exists(path):
         file_type = request.args.get('type')
         download_name = filename if filename else 'result_analysis.xlsx'
         if file_type == 'google':
@@ -307,16 +1119,260 @@ def delete_entry(entry_id):
 @app.route('/clear_history')
 @login_required
 def clear_all_history():
-    history = load_history()
-    for entry in history:
-        excel_path = os.path.join(app.config['UPLOAD_FOLDER'], entry['excel_filename'])
-        if os.path.exists(excel_path):
-            os.remove(excel_path)
+    from utils.analysis_store import delete_analysis
+    entries = HistoryEntry.query.filter_by(user_id=current_user.id)
+    for entry in entries:
+        delete_analysis(os.path.join(app.config['UPLOAD_FOLDER'], entry.excel_filename))
+        view_cache.invalidate(entry.id)
     
-    # Save an empty list for this user (load_history already filters by user)
-    save_history([])
+    delete_aggregates([entry.id for entry in entries])
+    entries.delete()
+    db.session.commit()
     return redirect(url_for('index'))
 
+@app.route('/api/trends')
+@login_required
+def trends():
+    """
+    Pass/fail counts for each of the user's analyses, oldest first, filtered by
+    any of dept, year, subject or register_no. Served from the aggregate
+    tables; responses carry an ETag so clients can revalidate for free.
+    """
+    dept = request.args.get('dept')
+    year = request.args.get('year')
+    subject = request.args.get('subject')
+    register_no = request.args.get('register_no')
+    page, per_page = page_args(max_per_page=200)
+    
+    if register_no and subject:
+        return json_response({'error': 'register_no cannot be combined with subject'}, 400)
+    
+    backfill_aggregates(current_user.id)
+    
+    model = StudentAggregate if register_no else SubjectAggregate
+    filters = [model.user_id == current_user.id]
+    if dept:
+        filters.append(model.dept == dept)
+    if year:
+        filters.append(model.year == year)
+    if subject:
+        filters.append(SubjectAggregate.subject == subject)
+    if register_no:
+        filters.append(StudentAggregate.register_no == register_no)
+    
+    grouped = (db.select(
+            model.history_id,
+            db.func.sum(model.passed).label('passed'),
+            db.func.sum(model.failed).label('failed'),
+            db.func.sum(model.total).label('total'))
+        .where(*filters)
+        .group_by(model.history_id)
+        .subquery())
+    query = (db.select(HistoryEntry.id, HistoryEntry.filename, HistoryEntry.date,
+                       grouped.c.passed, grouped.c.failed, grouped.c.total)
+             .join(grouped, grouped.c.history_id == HistoryEntry.id)
+             .order_by(HistoryEntry.date, HistoryEntry.id))
+    
+    total_items = db.session.execute(db.select(db.func.count()).select_from(grouped)).scalar()
+    rows = db.session.execute(query.limit(per_page).offset((page - 1) * per_page)).all()
+    
+    return json_response({
+        'filters': {'dept': dept, 'year': year, 'subject': subject, 'register_no': register_no},
+        'page': page,
+        'per_page': per_page,
+        'total': total_items,
+        'items': [{
+            'entry_id': row.id,
+            'filename': row.filename,
+            'date': row.date.strftime("%Y-%m-%d %H:%M:%S"),
+            'passed': row.passed,
+            'failed': row.failed,
+            'total': row.total,
+            'pass_percent': round(row.passed / row.total * 100, 2) if row.total else 0
+        } for row in rows]
+    })
+
+@app.route('/api/analysis/<entry_id>/subjects')
+@login_required
+def analysis_subjects(entry_id):
+    """Paginated Dept/Year/Subject pass-fail rows of one analysis, optionally for one dept/year."""
+    entry = get_history_entry(entry_id)
+    stats = entry and cached_stats(entry)
+    if not stats:
+        return json_response({'error': 'Analysis not found'}, 404)
+    
+    dept = request.args.get('dept')
+    year = request.args.get('year')
+    page, per_page = page_args()
+    
+    rows = [
+        {'dept': d, 'year': y, 'subject': subject, 'pass': counts['pass'], 'fail': counts['fail'],
+         'total': counts['total'],
+         'pass_percent': round(counts['pass'] / counts['total'] * 100, 1) if counts['total'] > 0 else 0}
+        for d in stats['departments'] if not dept or d == dept
+        for y, subjects in stats['dept_sub_stats'][d].items() if not year or str(y) == year
+        for subject, counts in subjects.items()
+    ]
+    return json_response({
+        'page': page,
+        'per_page': per_page,
+        'total': len(rows),
+        'items': rows[(page - 1) * per_page:page * per_page]
+    })
+
+@app.route('/api/analysis/<entry_id>/students')
+@login_required
+def analysis_students(entry_id):
+    """
+    Paginated student x subject grade matrix for one Dept/Year of an analysis,
+    optionally filtered by a register number substring (q).
+    """
+    entry = get_history_entry(entry_id)
+    version = entry and analysis_version(entry)
+    if not version:
+        return json_response({'error': 'Analysis not found'}, 404)
+    
+    dept = request.args.get('dept')
+    year = request.args.get('year')
+    if not dept or not year:
+        return json_response({'error': 'dept and year are required'}, 400)
+    query = request.args.get('q', '').strip().upper()
+    page, per_page = page_args()
+    
+    pivot_df = cached_pivot(entry, version, dept, year)
+    if pivot_df is not None and query:
+        pivot_df = pivot_df[pivot_df.index.astype(str).str.contains(query, regex=False)]
+    if pivot_df is None or pivot_df.empty:
+        return json_response({'dept': dept, 'year': year, 'subjects': [], 'page': page,
+                              'per_page': per_page, 'total': 0, 'items': []})
+    
+    page_df = pivot_df.iloc[(page - 1) * per_page:page * per_page]
+    return json_response({
+        'dept': dept,
+        'year': year,
+        'subjects': [str(c) for c in pivot_df.columns],
+        'page': page,
+        'per_page': per_page,
+        'total': len(pivot_df),
+        'items': [{'register_no': str(reg_no), 'grades': list(grades)}
+                  for reg_no, grades in zip(page_df.index, page_df.itertuples(index=False, name=None))]
+    })
+
+@app.route('/api/schemes', methods=['GET', 'POST'])
+@login_required
+def credit_schemes():
+    """Lists the user's credit schemes, or stores one uploaded as a JSON or CSV credit table."""
+    schemes = user_schemes()
+    if request.method == 'GET':
+        return json_response({'items': schemes.list()})
+    
+    file = request.files.get('file')
+    name = (request.form.get('name') or (file and os.path.splitext(file.filename)[0]) or '').strip()
+    if not file or not name:
+        return json_response({'error': 'A credit table file and a scheme name are required'}, 400)
+    try:
+        credits = parse_credit_table(file.read(), file.filename)
+        schemes.save(name, credits)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+    return json_response({'name': name, 'subjects': len(credits)}, 201)
+
+@app.route('/api/schemes/<name>', methods=['GET', 'DELETE'])
+@login_required
+def credit_scheme(name):
+    schemes = user_schemes()
+    try:
+        credits = schemes.get(name)
+    except ValueError:
+        credits = None
+    if credits is None:
+        return json_response({'error': 'Scheme not found'}, 404)
+    if request.method == 'DELETE':
+        schemes.delete(name)
+        return json_response({'deleted': name})
+    return json_response({'name': name, 'credits': credits})
+
+# JSON field names of the compute_sgpa columns
+SGPA_FIELDS = {'Register No': 'register_no', 'Dept': 'dept', 'Year': 'year', 'Credits': 'credits', 'Points': 'points',
+               'SGPA': 'sgpa', 'Failed': 'failed', 'Rank': 'rank', 'Dept Rank': 'dept_rank'}
+
+def analysis_sgpa(entry_id):
+    """(sgpa DataFrame, missing subjects, scheme name) for an analysis and the ?scheme= credit table; aborts on errors."""
+    from utils.sgpa import compute_sgpa
+    entry = get_history_entry(entry_id)
+    version = entry and analysis_version(entry)
+    stats = version and cached_stats(entry, version)
+    if not stats:
+        abort(json_response({'error': 'Analysis not found'}, 404))
+    name = request.args.get('scheme') or stats.get('sgpa_scheme')
+    if not name:
+        abort(json_response({'error': 'A credit scheme is required'}, 400))
+    _, credits = requested_scheme(name)
+    
+    # Keyed by the credit table itself, so editing a scheme is picked up at once
+    credits_hash = hashlib.sha1(json.dumps(credits, sort_keys=True).encode()).hexdigest()[:12]
+    sgpa_df = cached_analysis_frame(entry, f"sgpa:{version}:{credits_hash}",
+                                    lambda df, stats: compute_sgpa(df, credits)[0])
+    if sgpa_df is None:
+        abort(json_response({'error': 'Analysis not found'}, 404))
+    # The same list compute_sgpa returns, as stats['subjects'] holds every subject once
+    missing = sorted(set(map(str, stats['subjects'])) - set(credits))
+    return sgpa_df, missing, name
+
+@app.route('/api/analysis/<entry_id>/sgpa')
+@login_required
+def analysis_sgpa_ranks(entry_id):
+    """
+    Paginated SGPA rank list of an analysis under a credit scheme (?scheme=,
+    defaulting to the one chosen at upload), optionally for one dept/year.
+    """
+    sgpa_df, missing, scheme = analysis_sgpa(entry_id)
+    dept = request.args.get('dept')
+    year = request.args.get('year')
+    if dept:
+        sgpa_df = sgpa_df[sgpa_df['Dept'] == dept]
+    if year:
+        sgpa_df = sgpa_df[sgpa_df['Year'] == year]
+    page, per_page = page_args()
+    
+    page_df = sgpa_df.iloc[(page - 1) * per_page:page * per_page]
+    return json_response({
+        'scheme': scheme,
+        'missing_subjects': missing,
+        'page': page,
+        'per_page': per_page,
+        'total': len(sgpa_df),
+        'items': page_df.reset_index().rename(columns=SGPA_FIELDS).to_dict('records')
+    })
+
+@app.route('/api/analysis/<entry_id>/sgpa/distribution')
+@login_required
+def analysis_sgpa_distribution(entry_id):
+    """SGPA summary and band counts per Dept/Year of an analysis under a credit scheme."""
+    from utils.sgpa import sgpa_distribution
+    sgpa_df, missing, scheme = analysis_sgpa(entry_id)
+    return json_response({
+        'scheme': scheme,
+        'missing_subjects': missing,
+        'departments': sgpa_distribution(sgpa_df)
+    })
+
+@app.route('/analysis/<entry_id>/sgpa.xlsx')
+@login_required
+def download_sgpa(entry_id):
+    """The SGPA rank and distribution sheets of an analysis as a workbook of their own."""
+    from utils.excel_export import write_sgpa_sheets
+    from utils.sgpa import sgpa_distribution
+    from openpyxl import Workbook
+    sgpa_df, _, scheme = analysis_sgpa(entry_id)
+    wb = Workbook(write_only=True)
+    write_sgpa_sheets(wb, sgpa_df, sgpa_distribution(sgpa_df))
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return send_file(buffer, as_attachment=True, download_name=f"sgpa_{scheme}.xlsx",
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
 @app.route('/forgot_password', methods=['GET', 'POST'])
 def forgot_password():
     if current_user.is_authenticated:
@@ -326,30 +1382,21 @@ def forgot_password():
         email = request.form.get('email')
         user = User.query.filter_by(email=email).first()
         
+        # Both branches do the same work and give the same answer, and sending is
+        # only queued, so the response does not reveal which emails are registered
+        token = s.dumps(email, salt='password-reset-salt')
+        reset_url = url_for('reset_password', token=token, _external=True)
         if user:
-            token = s.dumps(email, salt='password-reset-salt')
-            reset_url = url_for('reset_password', token=token, _external=True)
-            
-            msg = Message('Password Reset Request',
-                          recipients=[email])
-            msg.body = f'''To reset your password, visit the following link:
+            # For development, you can print the URL to the console if mail is not configured
+            print(f"Reset URL: {reset_url}")
+            mailer.send('Password Reset Request', [email], f'''To reset your password, visit the following link:
 {reset_url}
 
 If you did not make this request then simply ignore this email and no changes will be made.
-'''
-            try:
-                # For development, you can print the URL to the console if mail is not configured
-                print(f"Reset URL: {reset_url}")
-                mail.send(msg)
-                flash('An email has been sent with instructions to reset your password.')
-            except Exception as e:
-                print(f"Error sending email: {e}")
-                flash('An email has been sent with instructions to reset your password. (Dev: Check console for link)')
-            
-            return redirect(url_for('login'))
-        else:
-            flash('If an account exists with that email, a reset link will be sent.')
-            return redirect(url_for('login'))
+''')
+        
+        flash('If an account exists with that email, a reset link has been sent to it.')
+        return redirect(url_for('login'))
             
     return render_template('forgot_password.html')
 
@@ -378,6 +1425,8 @@ def reset_password(token):
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        init_db()
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    start_storage_sweeper()
+    start_metrics_sharing()
     app.run(debug=True, port=5000)
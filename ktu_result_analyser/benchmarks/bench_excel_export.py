@@ -0,0 +1,112 @@
+"""
+Benchmark for the Excel export: peak RSS and wall time, old path vs new.
+
+The old path is the pandas/openpyxl ExcelWriter code /upload used to run,
+with a boolean mask slice and pivot_table per Dept/Year. The new path is
+utils.excel_export.write_analysis_workbook. Each mode runs in a fresh
+subprocess so peak RSS is not polluted by the other.
+
+Run from the ktu_result_analyser directory:
+    python -m benchmarks.bench_excel_export --students 50000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import result_frame
+from utils.excel_export import write_analysis_workbook
+from utils.pdf_processor import generate_stats
+
+def legacy_export(df, stats, excel_path):
+    """The inline ExcelWriter export from /upload before the export engine."""
+    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='All Results', index=False)
+        summary_data = []
+        for dept in stats['departments']:
+            for year, subjects in stats['dept_sub_stats'][dept].items():
+                for sub_code, sub_data in subjects.items():
+                    pass_p = (sub_data['pass'] / sub_data['total'] * 100) if sub_data['total'] > 0 else 0
+                    summary_data.append({
+                        'Department': dept,
+                        'Admission Year': year,
+                        'Subject Code': sub_code,
+                        'Passed': sub_data['pass'],
+                        'Failed/Abs': sub_data['fail'],
+                        'Total': sub_data['total'],
+                        'Pass %': round(pass_p, 2)
+                    })
+        if summary_data:
+            pd.DataFrame(summary_data).to_excel(writer, sheet_name='Summary Analytics', index=False)
+        groups = df[['Dept', 'Year']].drop_duplicates().sort_values(by=['Dept', 'Year'])
+        for _, row in groups.iterrows():
+            group_df = df[(df['Dept'] == row['Dept']) & (df['Year'] == row['Year'])]
+            if not group_df.empty:
+                pivot_df = group_df.pivot_table(index='Register No', columns='Subject', values='Grade', aggfunc='first')
+                pivot_df.fillna('-').to_excel(writer, sheet_name=f"{row['Dept']}_{row['Year']}"[:31])
+
+def peak_rss_mb():
+    try:
+        import resource
+        # ru_maxrss is in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+def run_one(mode, students, subjects, excel_path):
+    df = result_frame(students=students, subjects=subjects)
+    stats = generate_stats(df)
+    before = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == 'legacy':
+        legacy_export(df, stats, excel_path)
+    else:
+        write_analysis_workbook(df, stats, excel_path)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'mode': mode,
+        'seconds': round(elapsed, 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'rss_before_export_mb': round(before, 1),
+        'file_mb': round(os.path.getsize(excel_path) / (1024 * 1024), 2),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--subjects', type=int, default=8)
+    parser.add_argument('--mode', choices=['legacy', 'streaming'], help=argparse.SUPPRESS)
+    parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_one(args.mode, args.students, args.subjects, args.out)
+        return
+
+    print(f"Exporting {args.students:,} students x {args.subjects} subjects")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('legacy', 'streaming'):
+            out = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_excel_export', '--mode', mode,
+                 '--students', str(args.students), '--subjects', str(args.subjects),
+                 '--out', os.path.join(tmp, f'{mode}.xlsx')],
+                check=True, capture_output=True, text=True
+            ).stdout
+            results[mode] = json.loads(out.strip().splitlines()[-1])
+            r = results[mode]
+            print(f"{mode:9}: {r['seconds']:7.2f}s  peak RSS {r['peak_rss_mb']:7.1f} MB "
+                  f"(+{r['peak_rss_mb'] - r['rss_before_export_mb']:.1f} MB during export)")
+
+    print(f"speedup  : {results['legacy']['seconds'] / results['streaming']['seconds']:.1f}x")
+
+if __name__ == '__main__':
+    main()
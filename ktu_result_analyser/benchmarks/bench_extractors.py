@@ -0,0 +1,95 @@
+"""
+Parity check and timings for the PDF text extraction backends.
+
+Parses each PDF with every backend in utils.pdf_processor.BACKENDS and
+checks the DataFrame and stats are identical to the pdfplumber reference,
+exiting non-zero when any backend differs. Without arguments it runs on a
+set of synthetic result PDFs of different shapes.
+
+Run from the ktu_result_analyser directory:
+    python -m benchmarks.bench_extractors
+    python -m benchmarks.bench_extractors uploads/result.pdf --workers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import result_lines, write_result_pdf
+from utils.pdf_processor import BACKENDS, REFERENCE_BACKEND, process_pdf
+
+# (students, depts, subjects, CODE(GRADE) tokens per line, layout)
+# The column and shuffled layouts draw the text out of reading order, which
+# a backend returning text in drawing order gets wrong
+SYNTHETIC_SHAPES = [
+    (300, 5, 6, 4, 'lines'),
+    (500, 8, 8, 1, 'lines'),
+    (500, 7, 12, 6, 'lines'),
+    (3000, 5, 8, 3, 'lines'),
+    (300, 5, 6, 4, 'columns'),
+    (500, 8, 8, 1, 'columns'),
+    (300, 5, 6, 4, 'shuffled'),
+    (500, 7, 12, 6, 'shuffled'),
+]
+
+def synthetic_pdfs(directory):
+    paths = []
+    for students, depts, subjects, per_line, layout in SYNTHETIC_SHAPES:
+        path = os.path.join(directory, f"synthetic_{students}x{subjects}_{depts}d_{per_line}pl_{layout}.pdf")
+        write_result_pdf(path, result_lines(students, depts, subjects, per_line), layout=layout)
+        paths.append(path)
+    return paths
+
+def differences(df, stats, ref_df, ref_stats):
+    if df is None or ref_df is None:
+        return None if df is None and ref_df is None else 'only one backend extracted data'
+    try:
+        pd.testing.assert_frame_equal(df, ref_df)
+    except AssertionError as e:
+        return f"DataFrame differs: {str(e).splitlines()[0]}"
+    if stats != ref_stats:
+        return 'stats differ'
+    return None
+
+def check(paths, workers):
+    failures = 0
+    print(f"{'pdf':40}{'backend':>12}{'seconds':>10}{'rows':>9}  parity")
+    for path in paths:
+        start = time.perf_counter()
+        ref_df, ref_stats = process_pdf(path, workers=workers, backend=REFERENCE_BACKEND)
+        ref_time = time.perf_counter() - start
+        rows = 0 if ref_df is None else len(ref_df)
+        print(f"{os.path.basename(path)[:40]:40}{REFERENCE_BACKEND:>12}{ref_time:10.3f}{rows:9}  reference")
+
+        for name in BACKENDS:
+            if name == REFERENCE_BACKEND:
+                continue
+            start = time.perf_counter()
+            df, stats = process_pdf(path, workers=workers, backend=name)
+            elapsed = time.perf_counter() - start
+            problem = differences(df, stats, ref_df, ref_stats)
+            failures += problem is not None
+            rows = 0 if df is None else len(df)
+            print(f"{'':40}{name:>12}{elapsed:10.3f}{rows:9}  "
+                  f"{problem or 'identical'} ({ref_time / elapsed:.1f}x)")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pdfs', nargs='*', help='Result PDFs to check (default: synthetic PDFs)')
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        failures = check(args.pdfs or synthetic_pdfs(tmp), args.workers)
+
+    if failures:
+        print(f"{failures} backend run(s) differ from {REFERENCE_BACKEND}")
+        sys.exit(1)
+    print(f"All backends match {REFERENCE_BACKEND}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+Load test of the production server (gunicorn with wsgi.py) at different
+worker process counts.
+
+For each count it starts gunicorn on a throwaway database and upload
+folder, uploads a synthetic result PDF, then runs concurrent clients
+against the results page and its JSON endpoints for a fixed time. Optional
+uploader clients keep posting PDFs meanwhile, to show how much a running
+analysis slows everyone else down. Reports requests per second and latency
+percentiles per worker count.
+
+Run from the ktu_result_analyser directory:
+    python -m benchmarks.bench_load --workers 1 2 4 --clients 16 --duration 15
+    python -m benchmarks.bench_load --workers 1 4 --uploaders 2
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+from benchmarks.synthetic import result_lines, write_result_pdf
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class Client:
+    """Logged-in HTTP session against the server under test."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, path, data=None, headers=None):
+        """Returns (status, body); redirects are followed."""
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers or {})
+        try:
+            with self.opener.open(request, timeout=120) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def form(self, path, fields):
+        return self.request(path, urllib.parse.urlencode(fields).encode())
+
+    def upload(self, pdf_path):
+        """Posts a PDF to /upload and polls its job; returns the new entry id."""
+        boundary = uuid.uuid4().hex
+        with open(pdf_path, 'rb') as f:
+            body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="result.pdf"\r\n'
+                    f'Content-Type: application/pdf\r\n\r\n').encode() + f.read() + f'\r\n--{boundary}--\r\n'.encode()
+        status, data = self.request('/upload', body, {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        if status != 202:
+            raise RuntimeError(f"/upload returned {status}")
+        job = json.loads(data)
+        while True:
+            status, data = self.request(job['status_url'])
+            if status != 200:
+                raise RuntimeError(f"{job['status_url']} returned {status}")
+            state = json.loads(data)
+            if state['state'] == 'done':
+                break
+            if state['state'] == 'failed':
+                raise RuntimeError(f"Upload job failed: {state['error']}")
+            time.sleep(0.2)
+        request = urllib.request.Request(self.base_url + job['result_url'])
+        with self.opener.open(request, timeout=120) as response:
+            return response.url.rsplit('/', 1)[-1]
+
+def start_server(workers, threads, port, workdir):
+    env = dict(os.environ,
+               UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+               DATABASE_URL='sqlite:///' + os.path.join(workdir, 'load.db'),
+               PDF_WORKERS='1')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--threads', str(threads), '--access-logfile', '/dev/null', 'wsgi:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("gunicorn exited during startup")
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=5)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("gunicorn did not start within 60 seconds")
+
+def run_load(args, workers, pdf_path, paths):
+    with tempfile.TemporaryDirectory() as workdir:
+        port = free_port()
+        server = start_server(workers, args.threads, port, workdir)
+        try:
+            base_url = f'http://127.0.0.1:{port}'
+            setup = Client(base_url)
+            setup.form('/signup', {'email': 'load@example.com', 'name': 'Load', 'password': 'load'})
+            entry_id = setup.upload(pdf_path)
+            urls = [path.format(entry_id=entry_id) for path in paths]
+
+            stop = threading.Event()
+            latencies = []
+            errors = []
+            uploads = []
+            lock = threading.Lock()
+
+            def reader(offset):
+                client = Client(base_url)
+                client.form('/login', {'email': 'load@example.com', 'password': 'load'})
+                i = offset
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    status, _ = client.request(urls[i % len(urls)])
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        (latencies if status == 200 else errors).append(elapsed)
+                    i += 1
+
+            def uploader():
+                client = Client(base_url)
+                client.form('/login', {'email': 'load@example.com', 'password': 'load'})
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    client.upload(pdf_path)
+                    with lock:
+                        uploads.append(time.perf_counter() - start)
+
+            clients = [threading.Thread(target=reader, args=(i,)) for i in range(args.clients)]
+            clients += [threading.Thread(target=uploader) for _ in range(args.uploaders)]
+            started = time.perf_counter()
+            for thread in clients:
+                thread.start()
+            time.sleep(args.duration)
+            stop.set()
+            for thread in clients:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    return {
+        'workers': workers,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) if latencies else None,
+        'p95': latencies[int(len(latencies) * 0.95)] if latencies else None,
+        'uploads': len(uploads),
+        'upload_median': statistics.median(uploads) if uploads else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='gunicorn worker counts to test')
+    parser.add_argument('--threads', type=int, default=8, help='Request threads per worker')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent clients reading results')
+    parser.add_argument('--uploaders', type=int, default=0, help='Concurrent clients uploading PDFs')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds of load per worker count')
+    parser.add_argument('--students', type=int, default=2000)
+    args = parser.parse_args()
+
+    paths = [
+        '/view/{entry_id}',
+        '/api/analysis/{entry_id}/subjects?dept=CS&year=2019',
+        '/api/analysis/{entry_id}/students?dept=CS&year=2019',
+        '/api/trends',
+        '/',
+    ]
+
+    print(f"{os.cpu_count()} CPU(s), {args.clients} readers, {args.uploaders} uploaders, {args.duration:.0f}s per run")
+    print(f"{'workers':>8}{'req/s':>9}{'p50':>9}{'p95':>9}{'errors':>8}{'uploads':>9}{'upload p50':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'result.pdf')
+        write_result_pdf(pdf_path, result_lines(args.students))
+        for workers in args.workers:
+            result = run_load(args, workers, pdf_path, paths)
+            upload_median = f"{result['upload_median']:11.2f}s" if result['upload_median'] else f"{'-':>12}"
+            print(f"{workers:8}{result['rps']:9.1f}{result['p50'] * 1000:7.0f}ms{result['p95'] * 1000:7.0f}ms"
+                  f"{result['errors']:8}{result['uploads']:9}{upload_median}")
+
+if __name__ == '__main__':
+    main()
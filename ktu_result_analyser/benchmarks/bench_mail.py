@@ -0,0 +1,68 @@
+"""
+Password reset mail against the stand-in SMTP server in dev_smtp.py.
+
+Times POST /forgot_password for registered and unknown emails while the
+SMTP server takes --delay seconds per message, then waits for the outbox
+to deliver everything. Reports response times per case, the messages
+received and how many SMTP connections were used to send them. With
+--fail-first the first messages are answered with 451 to exercise retries.
+
+Run from the ktu_result_analyser directory:
+    python -m benchmarks.bench_mail --requests 50 --delay 0.2
+    python -m benchmarks.bench_mail --requests 10 --fail-first 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=50, help='Requests per case')
+    parser.add_argument('--delay', type=float, default=0.2, help='Seconds the SMTP server takes per message')
+    parser.add_argument('--fail-first', type=int, default=0, help='Messages answered with 451 before accepting')
+    parser.add_argument('--port', type=int, default=10250)
+    args = parser.parse_args()
+
+    from dev_smtp import DevSMTPServer
+    smtp = DevSMTPServer(port=args.port, delay=args.delay, fail_first=args.fail_first).start()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The app reads these at import time
+        os.environ.update(UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+                          DATABASE_URL='sqlite:///' + os.path.join(workdir, 'mail.db'),
+                          MAIL_SERVER='127.0.0.1', MAIL_PORT=str(args.port), MAIL_USE_TLS='false',
+                          MAIL_USE_SSL='false', MAIL_USERNAME='', MAIL_PASSWORD='',
+                          MAIL_DEFAULT_SENDER='noreply@example.com', MAIL_RETRY_DELAY='0.1')
+        from app import app, init_db, mailer
+        with app.app_context():
+            init_db()
+        client = app.test_client()
+        client.post('/signup', data={'email': 'staff@example.com', 'name': 'Staff', 'password': 'x'})
+        client.get('/logout')
+
+        times = {'registered': [], 'unknown': []}
+        for i in range(args.requests):
+            # Interleaved so both cases see the same conditions
+            for case, email in (('registered', 'staff@example.com'), ('unknown', f'nobody{i}@example.com')):
+                start = time.perf_counter()
+                response = client.post('/forgot_password', data={'email': email})
+                times[case].append(time.perf_counter() - start)
+                if response.status_code != 302:
+                    raise SystemExit(f"/forgot_password returned {response.status_code}")
+        start = time.perf_counter()
+        delivered = mailer.flush(timeout=args.requests * args.delay + 60)
+        drain = time.perf_counter() - start
+
+    for case, runs in times.items():
+        print(f"{case:11} median {statistics.median(runs) * 1000:7.2f}ms  max {max(runs) * 1000:7.2f}ms")
+    print(f"Outbox drained in {drain:.2f}s: {len(smtp.messages)} message(s) over "
+          f"{smtp.connections} SMTP connection(s)" + ('' if delivered else ' (timed out)'))
+    if len(smtp.messages) != args.requests:
+        print(f"Expected {args.requests} messages")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Micro-benchmark for the page scanner in utils.pdf_processor.
+
+Compares the original per-line regex loop against the compiled single pass
+scanner on a synthetic page corpus, reporting lines/sec for each. The
+scanner's ResultColumns are checked against the legacy rows.
+
+Run from the ktu_result_analyser directory:
+    python -m benchmarks.bench_scanner --students 20000
+"""
+import argparse
+import re
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import result_lines, result_pages
+from utils.pdf_processor import ResultColumns, _scan_page
+
+def legacy_parse(pages):
+    """The per-line loop process_pdf used before the scanner."""
+    data = []
+    current_reg_no = None
+    for text in pages:
+        for line in text.split('\n'):
+            reg_match = re.search(r'\b(([A-Z]{3})(\d{2})([A-Z]{2,3})(\d{3}))\b', line)
+            if reg_match:
+                current_reg_no = reg_match.group(1)
+            if current_reg_no:
+                sub_match = re.match(r'([A-Z]{3})(\d{2})([A-Z]{2,3})(\d{3})', current_reg_no)
+                year = sub_match.group(2)
+                dept = sub_match.group(3)
+                courses = re.findall(r'([A-Z]{3}\d{3})\(([\w\+]+)\)', line)
+                allowed_depts = {'CS', 'CE', 'EE', 'EC', 'ME', 'AI', 'AD'}
+                if dept in allowed_depts:
+                    for subject, grade in courses:
+                        data.append((current_reg_no, f"20{year}", dept, "", subject, grade))
+    return data
+
+def scanner_parse(pages):
+    rows = ResultColumns()
+    student = None
+    for text in pages:
+        student = _scan_page(text, student, rows)
+    return rows
+
+def same_rows(legacy_rows, columns):
+    """True when the scanner's columns hold the legacy (reg_no, year, dept, name, subject, grade) rows."""
+    legacy = pd.DataFrame([(reg_no, year, dept, subject, grade) for reg_no, year, dept, _, subject, grade in legacy_rows],
+                          columns=['Register No', 'Year', 'Dept', 'Subject', 'Grade'])
+    return columns.to_frame().astype(str).equals(legacy.astype(str))
+
+def best_of(func, pages, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = func(pages)
+        best = min(best, time.perf_counter() - start)
+    return best, rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=20000)
+    parser.add_argument('--subjects', type=int, default=8)
+    parser.add_argument('--per-line', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    lines = result_lines(students=args.students, depts=8, subjects=args.subjects, per_line=args.per_line)
+    pages = result_pages(lines)
+    print(f"Corpus: {len(lines)} lines, {len(pages)} pages")
+
+    legacy_time, legacy_rows = best_of(legacy_parse, pages, args.repeat)
+    scanner_time, scanner_rows = best_of(scanner_parse, pages, args.repeat)
+
+    if not same_rows(legacy_rows, scanner_rows):
+        raise SystemExit("Scanner output differs from the legacy parser")
+
+    print(f"legacy : {len(lines) / legacy_time:12,.0f} lines/sec ({legacy_time:.3f}s)")
+    print(f"scanner: {len(lines) / scanner_time:12,.0f} lines/sec ({scanner_time:.3f}s)")
+    print(f"speedup: {legacy_time / scanner_time:.1f}x")
+
+if __name__ == '__main__':
+    main()
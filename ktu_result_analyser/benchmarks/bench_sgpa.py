@@ -0,0 +1,53 @@
+"""
+Benchmark for the vectorized SGPA engine.
+
+Times compute_sgpa plus sgpa_distribution over a synthetic result and
+checks a sample of students against a plain per-student calculation, the
+way calculator.html scores one student.
+
+Run from the ktu_result_analyser directory:
+    python -m benchmarks.bench_sgpa --students 10000
+"""
+import argparse
+import time
+
+from benchmarks.synthetic import result_frame, subject_codes
+from utils.pdf_processor import compact_results
+from utils.sgpa import GRADE_POINTS, compute_sgpa, sgpa_distribution
+
+def calculator_sgpa(rows, credits):
+    """One student's SGPA from (subject, grade) pairs, as the calculator page computes it."""
+    points = sum(credits[subject] * GRADE_POINTS[grade] for subject, grade in rows if subject in credits)
+    total = sum(credits[subject] for subject, _ in rows if subject in credits)
+    return round(points / total, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--subjects', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    df = compact_results(result_frame(students=args.students, subjects=args.subjects))
+    codes = subject_codes(args.subjects)
+    credits = {code: 4 if i % 3 == 0 else 3 for i, code in enumerate(codes)}
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        sgpa_df, _ = compute_sgpa(df, credits)
+        sgpa_distribution(sgpa_df)
+        best = min(best, time.perf_counter() - start)
+
+    sample = sgpa_df.index[::max(1, len(sgpa_df) // 200)]
+    rows = df[df['Register No'].isin(sample)]
+    for reg_no, group in rows.groupby('Register No', observed=True):
+        expected = calculator_sgpa(list(zip(group['Subject'].astype(str), group['Grade'].astype(str))), credits)
+        if sgpa_df.at[reg_no, 'SGPA'] != expected:
+            raise SystemExit(f"SGPA of {reg_no} is {sgpa_df.at[reg_no, 'SGPA']}, expected {expected}")
+
+    print(f"{len(sgpa_df):,} students x {args.subjects} subjects: {best * 1000:.1f} ms "
+          f"(checked {len(sample)} students against the calculator)")
+
+if __name__ == '__main__':
+    main()
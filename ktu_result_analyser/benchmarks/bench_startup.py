@@ -0,0 +1,86 @@
+"""
+Cold start timings of the app: how long a fresh process takes to import
+app.py and answer its first GET /login, and which heavy analysis modules
+were loaded by then.
+
+Each run is a new interpreter against a throwaway database and upload
+folder. Pass --tree to time another checkout as well, for a before/after
+comparison (for example a `git worktree` of an earlier commit).
+
+Run from the ktu_result_analyser directory:
+    python -m benchmarks.bench_startup
+    git worktree add /tmp/before HEAD~1
+    python -m benchmarks.bench_startup --tree /tmp/before/ktu_result_analyser
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'pdfplumber', 'pypdfium2', 'openpyxl', 'flask_mail']
+
+# Runs in the child interpreter; prints one JSON line once the first response is in
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/login')
+answered = time.perf_counter()
+print(json.dumps({
+    'status': response.status_code,
+    'import': imported - start,
+    'first_response': answered - start,
+    'heavy': [name for name in %r if name in sys.modules],
+}), flush=True)
+''' % (HEAVY_MODULES,)
+
+def cold_start(tree):
+    """Starts one interpreter in tree; returns its timings with the process wall time to the first response."""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ,
+                   UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+                   DATABASE_URL='sqlite:///' + os.path.join(workdir, 'startup.db'))
+        started = time.perf_counter()
+        child = subprocess.Popen([sys.executable, '-c', CHILD], cwd=tree, env=env,
+                                 stdout=subprocess.PIPE, text=True)
+        line = child.stdout.readline()
+        wall = time.perf_counter() - started
+        child.communicate()
+    if not line:
+        raise SystemExit(f"App in {tree} did not start")
+    result = json.loads(line)
+    if result['status'] != 200:
+        raise SystemExit(f"GET /login in {tree} returned {result['status']}")
+    result['wall'] = wall
+    return result
+
+def measure(tree, repeat):
+    runs = [cold_start(tree) for _ in range(repeat)]
+    return {
+        'import': statistics.median(run['import'] for run in runs),
+        'first_response': statistics.median(run['first_response'] for run in runs),
+        'wall': statistics.median(run['wall'] for run in runs),
+        'heavy': runs[-1]['heavy'],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tree', action='append', default=[],
+                        help='Another ktu_result_analyser directory to time (repeatable)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    trees = [os.getcwd()] + args.tree
+    print(f"{'tree':40}{'import':>10}{'/login':>10}{'process':>10}  heavy modules loaded")
+    for tree in trees:
+        result = measure(tree, args.repeat)
+        print(f"{tree[-40:]:40}{result['import']:9.3f}s{result['first_response']:9.3f}s"
+              f"{result['wall']:9.3f}s  {', '.join(result['heavy']) or '-'}")
+
+if __name__ == '__main__':
+    main()
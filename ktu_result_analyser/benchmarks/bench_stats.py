@@ -0,0 +1,78 @@
+"""
+Benchmark for generate_stats on a large synthetic results DataFrame.
+
+Compares the original per-dept/year/subject mask filtering against the
+single groupby implementation and checks they produce the same stats.
+
+Run from the ktu_result_analyser directory:
+    python -m benchmarks.bench_stats --rows 1000000
+"""
+import argparse
+import time
+
+from benchmarks.synthetic import result_frame
+from utils.pdf_processor import generate_stats
+
+def legacy_generate_stats(df):
+    """generate_stats as it was before the groupby rewrite."""
+    stats = {
+        'total_students': df['Register No'].nunique(),
+        'total_entries': len(df),
+        'subjects': df['Subject'].unique().tolist(),
+        'departments': sorted(df['Dept'].unique().tolist()),
+        'dept_sub_stats': {}
+    }
+    for dept in stats['departments']:
+        stats['dept_sub_stats'][dept] = {}
+        dept_df = df[df['Dept'] == dept]
+        years = sorted(dept_df['Year'].unique().tolist())
+        for year in years:
+            stats['dept_sub_stats'][dept][year] = {}
+            year_df = dept_df[dept_df['Year'] == year]
+            for subject in year_df['Subject'].unique().tolist():
+                subj_df = year_df[year_df['Subject'] == subject]
+                fail_df = subj_df[subj_df['Grade'].isin(['F', 'FE', 'Absent'])]
+                stats['dept_sub_stats'][dept][year][subject] = {
+                    'pass': len(subj_df) - len(fail_df),
+                    'fail': len(fail_df),
+                    'total': len(subj_df)
+                }
+    stats['dept_summary'] = {}
+    for dept in stats['departments']:
+        dept_df = df[df['Dept'] == dept]
+        stats['dept_summary'][dept] = {
+            'count': dept_df['Register No'].nunique(),
+            'entries': len(dept_df)
+        }
+    return stats
+
+def timed(func, df, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--subjects', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = result_frame(students=max(1, args.rows // args.subjects), subjects=args.subjects)
+    print(f"DataFrame: {len(df):,} rows, {df['Register No'].nunique():,} students")
+
+    legacy_time, legacy_stats = timed(legacy_generate_stats, df, args.repeat)
+    new_time, new_stats = timed(generate_stats, df, args.repeat)
+
+    if legacy_stats != new_stats:
+        raise SystemExit("groupby stats differ from the legacy implementation")
+
+    print(f"legacy : {legacy_time:.3f}s")
+    print(f"groupby: {new_time:.3f}s")
+    print(f"speedup: {legacy_time / new_time:.1f}x")
+
+if __name__ == '__main__':
+    main()
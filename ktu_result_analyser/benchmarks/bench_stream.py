@@ -0,0 +1,97 @@
+"""
+Peak memory of parsing long result PDFs: process_pdf, which builds every row
+before the DataFrame, vs iter_result_batches streamed to a Feather file with
+write_result_batches and incremental stats.
+
+Writes a synthetic PDF per --pages value, then parses it in a fresh
+subprocess per mode so peak RSS is not polluted by the other. The streamed
+stats and the stored rows are checked against process_pdf, exiting non-zero
+on a mismatch.
+
+Run from the ktu_result_analyser directory:
+    python -m benchmarks.bench_stream --pages 500 1000 2000
+    python -m benchmarks.bench_stream --pages 300 --backend pdfplumber
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_excel_export import peak_rss_mb
+from benchmarks.synthetic import result_lines, write_result_pdf
+
+# 8 subjects at 4 per line: 2 lines, so 30 students, per 60-line page
+SUBJECTS = 8
+PER_LINE = 4
+STUDENTS_PER_PAGE = 30
+
+def run_one(mode, pdf_path, out_dir, backend, batch_pages):
+    from utils.analysis_store import write_result_batches, write_results
+    from utils.pdf_processor import iter_result_batches, process_pdf
+    frame_path = os.path.join(out_dir, f'{mode}.feather')
+    stats_path = os.path.join(out_dir, f'{mode}.json')
+    before = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == 'process_pdf':
+        df, stats = process_pdf(pdf_path, workers=1, backend=backend)
+        write_results(frame_path, stats_path, df, stats)
+    else:
+        write_result_batches(frame_path, stats_path, iter_result_batches(pdf_path, batch_pages, backend=backend))
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'mode': mode,
+        'seconds': round(elapsed, 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'rss_before_parse_mb': round(before, 1),
+    }))
+
+def same_results(out_dir):
+    """True when both modes stored the same rows and stats."""
+    from utils.analysis_store import read_results
+    df, stats = read_results(os.path.join(out_dir, 'process_pdf.feather'), os.path.join(out_dir, 'process_pdf.json'))
+    stream_df, stream_stats = read_results(os.path.join(out_dir, 'stream.feather'), os.path.join(out_dir, 'stream.json'))
+    return stats == stream_stats and df.astype(str).equals(stream_df.astype(str))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[500, 2000])
+    parser.add_argument('--backend', help='Text extraction backend (default: pdfplumber)')
+    parser.add_argument('--batch-pages', type=int, default=50)
+    parser.add_argument('--mode', choices=['process_pdf', 'stream'], help=argparse.SUPPRESS)
+    parser.add_argument('--pdf', help=argparse.SUPPRESS)
+    parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_one(args.mode, args.pdf, args.out, args.backend, args.batch_pages)
+        return
+
+    mismatches = 0
+    print(f"{'pages':>6}{'mode':>13}{'seconds':>10}{'peak RSS':>11}{'parse':>10}")
+    for pages in args.pages:
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = os.path.join(tmp, 'result.pdf')
+            write_result_pdf(pdf_path, result_lines(pages * STUDENTS_PER_PAGE, subjects=SUBJECTS, per_line=PER_LINE))
+            for mode in ('process_pdf', 'stream'):
+                command = [sys.executable, '-m', 'benchmarks.bench_stream', '--mode', mode, '--pdf', pdf_path,
+                           '--out', tmp, '--batch-pages', str(args.batch_pages)]
+                if args.backend:
+                    command += ['--backend', args.backend]
+                out = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+                r = json.loads(out.strip().splitlines()[-1])
+                print(f"{pages:6}{mode:>13}{r['seconds']:10.2f}{r['peak_rss_mb']:8.1f} MB"
+                      f"{r['peak_rss_mb'] - r['rss_before_parse_mb']:+7.1f} MB")
+            if not same_results(tmp):
+                print(f"{pages:6} pages: streamed results differ from process_pdf")
+                mismatches += 1
+
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+End to end benchmark suite on a synthetic KTU result PDF.
+
+Generates a result PDF of the requested size, then times process_pdf,
+generate_stats, the Excel export, a full /upload job and /view (plus the
+first page of each JSON endpoint the results page fetches) through the
+Flask test client. The app runs against a throwaway database and upload
+folder, so the real ones are never touched.
+
+Results are written as JSON so runs can be compared between commits:
+    python -m benchmarks.run_suite --students 5000
+    python -m benchmarks.run_suite --students 5000 --compare benchmarks/results/<commit>.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.synthetic import result_lines, write_result_pdf
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def timed(func, repeat):
+    """Runs func repeat times; returns (timing summary, last result)."""
+    runs = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - start)
+    return {
+        'best': round(min(runs), 4),
+        'median': round(statistics.median(runs), 4),
+        'runs': [round(r, 4) for r in runs],
+    }, result
+
+def run_upload(client, pdf_path):
+    """Posts the PDF to /upload and polls the job until it finishes; returns the /view URL."""
+    with open(pdf_path, 'rb') as f:
+        response = client.post('/upload', data={'file': (f, 'result.pdf')}, content_type='multipart/form-data')
+    if response.status_code != 202:
+        raise SystemExit(f"/upload returned {response.status_code}")
+    job = response.get_json()
+    while True:
+        status = client.get(job['status_url']).get_json()
+        if status['state'] == 'done':
+            return client.get(job['result_url']).location
+        if status['state'] == 'failed':
+            raise SystemExit(f"Upload job failed: {status['error']}")
+        time.sleep(0.02)
+
+def run_suite(args, workdir):
+    # The app reads these at import time
+    os.environ['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ['PDF_WORKERS'] = str(args.workers)
+    if args.backend:
+        os.environ['PDF_BACKEND'] = args.backend
+    os.makedirs(os.environ['UPLOAD_FOLDER'])
+
+    from utils.excel_export import write_analysis_workbook
+    from utils.pdf_processor import process_pdf, generate_stats
+
+    pdf_path = os.path.join(workdir, 'result.pdf')
+    lines = result_lines(args.students, args.depts, args.subjects, args.per_line)
+    pages = write_result_pdf(pdf_path, lines, args.lines_per_page)
+    print(f"PDF: {args.students:,} students, {pages:,} pages, {os.path.getsize(pdf_path) / 1024:.0f} KB")
+
+    results = {}
+
+    results['process_pdf'], (df, stats) = timed(
+        lambda: process_pdf(pdf_path, workers=args.workers, backend=args.backend), args.repeat)
+    if df is None:
+        raise SystemExit("process_pdf extracted no data")
+    results['generate_stats'], _ = timed(lambda: generate_stats(df), args.repeat)
+    excel_path = os.path.join(workdir, 'export.xlsx')
+    results['excel_export'], _ = timed(lambda: write_analysis_workbook(df, stats, excel_path), args.repeat)
+
+    from app import app, init_db
+    with app.app_context():
+        init_db()
+    client = app.test_client()
+    client.post('/signup', data={'email': 'bench@example.com', 'name': 'Bench', 'password': 'bench'})
+
+    # Every upload after the first would be a parse cache hit, so this one runs once
+    results['upload'], view_url = timed(lambda: run_upload(client, pdf_path), 1)
+    entry_id = view_url.rsplit('/', 1)[-1]
+    dept, year = stats['departments'][0], next(iter(stats['dept_sub_stats'][stats['departments'][0]]))
+
+    def get(url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise SystemExit(f"{url} returned {response.status_code}")
+        return len(response.data)
+
+    results['view'], view_bytes = timed(lambda: get(view_url), args.repeat)
+    results['api_subjects'], _ = timed(lambda: get(f'/api/analysis/{entry_id}/subjects?dept={dept}&year={year}'), args.repeat)
+    results['api_students'], _ = timed(lambda: get(f'/api/analysis/{entry_id}/students?dept={dept}&year={year}'), args.repeat)
+
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'params': {
+            'students': args.students,
+            'depts': args.depts,
+            'subjects': args.subjects,
+            'per_line': args.per_line,
+            'lines_per_page': args.lines_per_page,
+            'workers': args.workers,
+            'backend': args.backend,
+            'repeat': args.repeat,
+        },
+        'data': {
+            'pages': pages,
+            'rows': len(df),
+            'students': stats['total_students'],
+            'view_bytes': view_bytes,
+        },
+        'results': results,
+    }
+
+def print_report(report, baseline=None):
+    print(f"{'benchmark':16}{'best':>10}{'median':>10}" + (f"{'baseline':>10}{'change':>9}" if baseline else ''))
+    for name, timing in report['results'].items():
+        line = f"{name:16}{timing['best']:9.3f}s{timing['median']:9.3f}s"
+        old = baseline and baseline['results'].get(name)
+        if old:
+            line += f"{old['best']:9.3f}s{(timing['best'] / old['best'] - 1) * 100:+8.1f}%"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--depts', type=int, default=5)
+    parser.add_argument('--subjects', type=int, default=8)
+    parser.add_argument('--per-line', type=int, default=4, help='CODE(GRADE) tokens per line')
+    parser.add_argument('--lines-per-page', type=int, default=60)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--backend', help='PDF text extraction backend (default: the app default)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='JSON report path (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='Earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        report = run_suite(args, workdir)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['params'] != report['params']:
+            print(f"Warning: baseline was run with different parameters: {baseline['params']}", file=sys.stderr)
+    print_report(report, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {output}")
+
+if __name__ == '__main__':
+    main()
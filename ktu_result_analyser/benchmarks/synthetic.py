@@ -0,0 +1,165 @@
+"""
+Synthetic KTU result data for benchmarks.
+
+Lines follow the layout of the university result PDFs: a register number
+followed by CODE(GRADE) tokens, wrapping onto continuation lines.
+
+Also writes those lines out as a real PDF, so process_pdf can be measured
+end to end. Run from the ktu_result_analyser directory:
+    python -m benchmarks.synthetic result.pdf --students 5000 --per-line 3
+"""
+import argparse
+import random
+import zlib
+
+import numpy as np
+import pandas as pd
+
+GRADES = ['S', 'A+', 'A', 'B+', 'B', 'C+', 'C', 'D', 'P', 'F', 'FE', 'Absent']
+DEPTS = ['CS', 'CE', 'EE', 'EC', 'ME', 'AD', 'AI', 'CHE']
+SUBJECT_PREFIXES = ['MAT', 'CST', 'EST', 'PHT', 'HUN', 'CYT', 'MCN', 'ECT', 'EET', 'MET', 'CET', 'ADT']
+
+HEADER = [
+    'APJ ABDUL KALAM TECHNOLOGICAL UNIVERSITY',
+    'B.Tech S3 (R,S) Exam Dec 2022 (2019 Scheme)',
+    'Exam Centre: BMC',
+]
+
+def subject_codes(count):
+    return [f"{SUBJECT_PREFIXES[i % len(SUBJECT_PREFIXES)]}{201 + i:03d}" for i in range(count)]
+
+def result_lines(students=1000, depts=5, subjects=6, per_line=4, college='BMC', seed=1):
+    """Returns the text lines of a result listing, header included."""
+    rnd = random.Random(seed)
+    dept_codes = DEPTS[:depts]
+    codes = subject_codes(subjects)
+    lines = list(HEADER)
+
+    for i in range(students):
+        dept = dept_codes[i % len(dept_codes)]
+        year = 19 + (i // len(dept_codes)) % 4
+        reg_no = f"{college}{year}{dept}{(i // (len(dept_codes) * 4)) % 1000:03d}"
+        tokens = [f"{code}({rnd.choice(GRADES)})" for code in codes]
+        chunks = [', '.join(tokens[j:j + per_line]) for j in range(0, len(tokens), per_line)] or ['']
+        lines.append(f"{reg_no} {chunks[0]}")
+        lines.extend(chunks[1:])
+
+    return lines
+
+def result_pages(lines, lines_per_page=60):
+    """Groups lines into page texts the way extract_text() returns them."""
+    return ['\n'.join(lines[i:i + lines_per_page]) for i in range(0, len(lines), lines_per_page)]
+
+def _pdf_string(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+# Ways write_result_pdf can order the text it draws. Result PDFs generated
+# from tables are often drawn a column at a time rather than a line at a time
+LAYOUTS = ('lines', 'columns', 'shuffled')
+
+def _page_ops(page_lines, layout, rnd):
+    """Content stream operators drawing one page of lines in the given layout."""
+    if layout == 'lines':
+        return ['BT /F1 9 Tf 12 TL 36 806 Td', *(f'({_pdf_string(line)}) Tj T*' for line in page_lines), 'ET']
+
+    # Each line is split into a first column (the register number on student
+    # lines) and the rest, and every cell is placed at its own position
+    cells = []
+    for i, line in enumerate(page_lines):
+        head, _, rest = line.partition(' ')
+        y = 806 - 12 * i
+        cells.append((0, i, 36, y, head))
+        if rest:
+            cells.append((1, i, 120, y, rest))
+    if layout == 'columns':
+        cells.sort()
+    else:
+        rnd.shuffle(cells)
+    return [f'BT /F1 9 Tf 1 0 0 1 {x} {y} Tm ({_pdf_string(text)}) Tj ET' for _, _, x, y, text in cells]
+
+def write_result_pdf(path, lines, lines_per_page=60, layout='lines', seed=1):
+    """
+    Writes lines as a minimal text PDF (Helvetica, one line per text row),
+    which pdfplumber extracts back line for line. With layout 'columns' the
+    first word of every line on a page is drawn before the rest of the
+    lines, and with 'shuffled' the cells are drawn in random order; the page
+    looks the same, only the order in the content stream changes.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}', expected one of {', '.join(LAYOUTS)}")
+    rnd = random.Random(seed)
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    # Object 1 is the catalog, 2 the page tree, 3 the font, then one page/content pair per page
+    objects = {
+        1: b'<< /Type /Catalog /Pages 2 0 R >>',
+        3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    }
+    kids = []
+    for i, page_lines in enumerate(pages):
+        page_obj, content_obj = 4 + 2 * i, 5 + 2 * i
+        kids.append(f'{page_obj} 0 R')
+        ops = _page_ops(page_lines, layout, rnd)
+        data = zlib.compress('\n'.join(ops).encode('latin-1'))
+        objects[content_obj] = b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(data) + data + b'\nendstream'
+        objects[page_obj] = (f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                             f'/Resources << /Font << /F1 3 0 R >> >> /Contents {content_obj} 0 R >>').encode()
+    objects[2] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(pages)} >>'.encode()
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number in sorted(objects):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + objects[number] + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+
+    with open(path, 'wb') as f:
+        f.write(out)
+    return len(pages)
+
+def result_frame(students=10000, depts=7, subjects=8, seed=1):
+    """
+    Builds a parsed-results DataFrame directly (one row per student/subject),
+    for benchmarks that start after the PDF has been parsed.
+    """
+    rng = np.random.default_rng(seed)
+    dept_codes = np.array(DEPTS[:depts])
+    codes = np.array(subject_codes(subjects))
+
+    student = np.repeat(np.arange(students), subjects)
+    dept = dept_codes[student % depts]
+    year = (19 + (student // depts) % 4).astype(str)
+    roll = np.char.zfill(((student // (depts * 4)) % 1000).astype(str), 3)
+    college = np.array(['BMC', 'TVE', 'MDL', 'KTE'])[(student // (depts * 4000)) % 4]
+    reg_no = np.char.add(np.char.add(np.char.add(college, year), dept), roll)
+
+    return pd.DataFrame({
+        'Register No': reg_no.astype(object),
+        'Year': np.char.add('20', year).astype(object),
+        'Dept': dept.astype(object),
+        'Name': '',
+        'Subject': np.tile(codes, students).astype(object),
+        'Grade': np.array(GRADES)[rng.integers(0, len(GRADES), len(student))].astype(object),
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description='Writes a synthetic KTU result PDF.')
+    parser.add_argument('path')
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--depts', type=int, default=5)
+    parser.add_argument('--subjects', type=int, default=6)
+    parser.add_argument('--per-line', type=int, default=4, help='CODE(GRADE) tokens per line')
+    parser.add_argument('--lines-per-page', type=int, default=60)
+    parser.add_argument('--layout', choices=LAYOUTS, default='lines', help='Order the text is drawn in')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    lines = result_lines(args.students, args.depts, args.subjects, args.per_line, seed=args.seed)
+    pages = write_result_pdf(args.path, lines, args.lines_per_page, args.layout, args.seed)
+    print(f"Wrote {args.path}: {args.students:,} students, {pages:,} pages")
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,13 @@
-from utils.pdf_processor import process_pdf
 import os
+import sys
+
+from utils.pdf_processor import process_pdf
+
+if len(sys.argv) != 2:
+    print("Usage: python debug_pdf.py <result.pdf>")
+    sys.exit(1)
 
-pdf_path = r"c:\Users\anish\Documents\ktu\ktu_result_analyser\uploads\result_BMC (58).pdf"
+pdf_path = sys.argv[1]
 
 if not os.path.exists(pdf_path):
     print(f"File not found: {pdf_path}")
@@ -15,6 +21,7 @@ else:
         print("\n--- Departments Found ---")
         print(df['Dept'].unique())
         print("\n--- Stats ---")
-        print(stats['dept_stats'])
+        print(stats['dept_summary'])
+        print(stats['dept_sub_stats'])
     else:
         print("No data extracted.")
@@ -0,0 +1,120 @@
+"""
+Stand-in SMTP server for development and tests. It accepts every message
+and prints it (or saves it as .eml files) instead of delivering it.
+
+    python dev_smtp.py --port 1025
+    MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=false python app.py
+
+--delay makes each message slow to accept, and --fail-first answers the
+first N messages with a temporary 451 error. Together they show that
+requests never wait on mail and that the outbox retries.
+"""
+import argparse
+import os
+import socketserver
+import threading
+import time
+
+class DevSMTPServer(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server (no TLS or auth) that records the messages it receives."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=1025, delay=0, fail_first=0, maildir=None, verbose=False):
+        super().__init__((host, port), SMTPHandler)
+        self.delay = delay
+        self.fail_first = fail_first
+        self.maildir = maildir
+        self.verbose = verbose
+        self.messages = []  # (sender, recipients, data)
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Serves on a daemon thread; returns the server."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def accept_message(self, sender, recipients, data):
+        """Returns the SMTP reply to the end of DATA."""
+        with self.lock:
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                return '451 Temporary failure, try again later'
+            self.messages.append((sender, recipients, data))
+            count = len(self.messages)
+        if self.maildir:
+            os.makedirs(self.maildir, exist_ok=True)
+            with open(os.path.join(self.maildir, f"{int(time.time() * 1000)}_{count}.eml"), 'wb') as f:
+                f.write(data)
+        if self.verbose:
+            print(f"---------- message {count} from {sender} to {', '.join(recipients)}")
+            print(data.decode('utf-8', 'replace'))
+        return '250 OK'
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        sender, recipients = None, []
+        self.reply('220 localhost dev SMTP ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(line[1:] if line.startswith(b'..') else line)
+                time.sleep(server.delay)
+                self.reply(server.accept_message(sender, recipients, b''.join(lines)))
+                sender, recipients = None, []
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--delay', type=float, default=0, help='Seconds to take accepting each message')
+    parser.add_argument('--fail-first', type=int, default=0, help='Answer the first N messages with 451')
+    parser.add_argument('--maildir', help='Save messages as .eml files here instead of printing them')
+    args = parser.parse_args()
+
+    server = DevSMTPServer(args.host, args.port, args.delay, args.fail_first, args.maildir,
+                           verbose=not args.maildir)
+    print(f"Dev SMTP server listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
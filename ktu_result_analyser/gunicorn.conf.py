@@ -0,0 +1,26 @@
+"""
+gunicorn settings for production: gunicorn -c gunicorn.conf.py wsgi:app
+
+Each worker process runs its own pool of UPLOAD_WORKERS analysis threads,
+so at most WEB_WORKERS x UPLOAD_WORKERS uploads are parsed at once. Workers
+share their metrics through METRICS_DIR, so /metrics reports the totals of
+the whole server whichever worker answers.
+"""
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_WORKERS', os.cpu_count() or 1))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 8))
+# Large PDFs take a while to receive; analysis itself runs in the background
+timeout = int(os.getenv('WEB_TIMEOUT', 120))
+graceful_timeout = 60
+accesslog = os.getenv('ACCESS_LOG', '-')
+
+# Workers load the parsing stack after their first response rather than on the first upload
+os.environ.setdefault('PREWARM_ANALYSIS', '1')
+
+def on_starting(server):
+    # Metrics start from zero with the server; files of the last run's workers are dropped
+    from utils.metrics import clear_shared
+    clear_shared(os.getenv('METRICS_DIR', os.path.join(os.getenv('UPLOAD_FOLDER', 'uploads'), 'metrics')))
@@ -1,13 +1,18 @@
 from flaskwebgui import FlaskUI
-from app import app, db
+from app import app, init_db, start_metrics_sharing, start_storage_sweeper
 import os
 
 def start_app():
     # Initialize database and folders
     with app.app_context():
-        db.create_all()
+        init_db()
     
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    start_storage_sweeper()
+    start_metrics_sharing()
+
+    # Load the PDF/analysis modules in the background once the window has its first page
+    app.config['PREWARM_ANALYSIS'] = True
 
     # Configure the UI
     # This will automatically start Flask and open a browser window in app mode
@@ -0,0 +1,25 @@
+"""
+The text extraction backends must parse a result PDF into the same rows and
+stats. A quicker, always-on version of benchmarks.bench_extractors.
+
+Run from the ktu_result_analyser directory:
+    python -m pytest tests
+"""
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import LAYOUTS, result_lines, write_result_pdf
+from utils.pdf_processor import REFERENCE_BACKEND, pdfium, process_pdf
+
+@pytest.mark.skipif(pdfium is None, reason='pypdfium2 is not installed')
+@pytest.mark.parametrize('layout', LAYOUTS)
+def test_pdfium_matches_pdfplumber(tmp_path, layout):
+    path = str(tmp_path / f'{layout}.pdf')
+    write_result_pdf(path, result_lines(students=200, depts=5, subjects=6, per_line=4), layout=layout)
+
+    ref_df, ref_stats = process_pdf(path, backend=REFERENCE_BACKEND)
+    df, stats = process_pdf(path, backend='pdfium')
+
+    assert ref_df is not None and len(ref_df)
+    pd.testing.assert_frame_equal(df, ref_df)
+    assert stats == ref_stats
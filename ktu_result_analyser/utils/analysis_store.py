@@ -0,0 +1,155 @@
+import json
+import os
+import uuid
+
+import pandas as pd
+
+from utils.pdf_processor import CATEGORICAL_COLUMNS, StatsAccumulator, compact_results, generate_stats
+
+def write_results(frame_path, stats_path, df, stats):
+    """
+    Writes a results DataFrame as Feather and its stats as JSON.
+    Both files are written under temporary names and renamed into place so a
+    concurrent reader never sees a partial file.
+    """
+    tmp = f".{uuid.uuid4().hex}.tmp"
+    try:
+        df.reset_index(drop=True).to_feather(frame_path + tmp, compression='zstd')
+        with open(stats_path + tmp, 'w') as f:
+            json.dump(stats, f, default=int)
+        os.replace(stats_path + tmp, stats_path)
+        os.replace(frame_path + tmp, frame_path)
+    finally:
+        for path in (frame_path + tmp, stats_path + tmp):
+            if os.path.exists(path):
+                os.remove(path)
+
+def write_frame_batches(frame_path, batches):
+    """
+    Appends each results DataFrame from batches to a new Feather file as a
+    record batch, so only one batch is in memory at a time. Columns are
+    stored as plain strings, since categories cannot change between the
+    batches of one file; read_results makes them categorical again.
+    Returns:
+        The number of rows written; with none, no file is created.
+    """
+    import pyarrow as pa
+    rows = 0
+    writer = None
+    try:
+        for df in batches:
+            table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+            table = table.cast(pa.schema([(name, pa.string()) for name in table.column_names]))
+            if writer is None:
+                writer = pa.ipc.new_file(frame_path, table.schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+            writer.write_table(table)
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def write_result_batches(frame_path, stats_path, batches):
+    """
+    Streaming counterpart of write_results for results that arrive in
+    batches, such as iter_result_batches output: each batch is written with
+    write_frame_batches and folded into the stats as soon as it arrives.
+    Both files appear only once complete, as with write_results.
+    Returns:
+        The stats, or None (and nothing written) when no batch has rows.
+    """
+    tmp = f".{uuid.uuid4().hex}.tmp"
+    accumulator = StatsAccumulator()
+
+    def counted():
+        for df in batches:
+            accumulator.add(df)
+            yield df
+
+    try:
+        if not write_frame_batches(frame_path + tmp, counted()):
+            return None
+        stats = accumulator.result()
+        with open(stats_path + tmp, 'w') as f:
+            json.dump(stats, f, default=int)
+        os.replace(stats_path + tmp, stats_path)
+        os.replace(frame_path + tmp, frame_path)
+        return stats
+    finally:
+        for path in (frame_path + tmp, stats_path + tmp):
+            if os.path.exists(path):
+                os.remove(path)
+
+def read_result_batches(frame_path):
+    """
+    Yields a stored results file one record batch at a time as DataFrames,
+    memory mapped, so generate_stats() can run over it without loading it all.
+    """
+    import pyarrow as pa
+    with pa.memory_map(frame_path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i).to_pandas()
+
+def read_results(frame_path, stats_path):
+    """Reads back what write_results stored. Raises OSError/ValueError if missing or corrupt."""
+    df = pd.read_feather(frame_path)
+    # Files written batch by batch hold plain strings
+    if not all(isinstance(df[column].dtype, pd.CategoricalDtype) for column in CATEGORICAL_COLUMNS if column in df.columns):
+        df = compact_results(df)
+    with open(stats_path, 'r') as f:
+        stats = json.load(f)
+    return df, stats
+
+def analysis_paths(excel_path):
+    """Columnar results and stats files kept next to an analysis workbook."""
+    stem, _ = os.path.splitext(excel_path)
+    return stem + '.feather', stem + '.stats.json'
+
+def save_analysis(excel_path, df, stats):
+    frame_path, stats_path = analysis_paths(excel_path)
+    write_results(frame_path, stats_path, df, stats)
+
+def _from_workbook(excel_path):
+    """Loads the 'All Results' sheet of an exported workbook in the parser's compact format."""
+    df = pd.read_excel(excel_path, sheet_name='All Results', dtype=str)
+    return compact_results(df)
+
+def load_analysis(excel_path):
+    """
+    Returns (df, stats) for a stored analysis, or None if it does not exist.
+    Analyses saved before the columnar store only have the workbook; those are
+    read from Excel once and migrated so later loads skip openpyxl.
+    """
+    frame_path, stats_path = analysis_paths(excel_path)
+    try:
+        return read_results(frame_path, stats_path)
+    except (OSError, ValueError):
+        pass
+
+    if not os.path.exists(excel_path):
+        return None
+
+    df = _from_workbook(excel_path)
+    stats = generate_stats(df)
+    try:
+        save_analysis(excel_path, df, stats)
+    except Exception as e:
+        print(f"Error migrating analysis {excel_path}: {e}")
+    return df, stats
+
+def load_stats(excel_path):
+    """Returns only the stats of a stored analysis, without reading its results."""
+    _, stats_path = analysis_paths(excel_path)
+    try:
+        with open(stats_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        analysis = load_analysis(excel_path)
+        return analysis[1] if analysis else None
+
+def delete_analysis(excel_path):
+    """Removes the workbook and its columnar files."""
+    for path in (excel_path, *analysis_paths(excel_path)):
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,99 @@
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+SUMMARY_COLUMNS = ['Department', 'Admission Year', 'Subject Code', 'Passed', 'Failed/Abs', 'Total', 'Pass %']
+SGPA_DISTRIBUTION_COLUMNS = ['Department', 'Admission Year', 'Students', 'Mean SGPA', 'Median SGPA',
+                             'Min SGPA', 'Max SGPA', 'Passed All']
+
+def summary_rows(stats):
+    """Flattens stats['dept_sub_stats'] into rows for the 'Summary Analytics' sheet."""
+    for dept in stats['departments']:
+        for year, subjects in stats['dept_sub_stats'][dept].items():
+            for sub_code, sub_data in subjects.items():
+                pass_p = (sub_data['pass'] / sub_data['total'] * 100) if sub_data['total'] > 0 else 0
+                yield [dept, year, sub_code, sub_data['pass'], sub_data['fail'], sub_data['total'], round(pass_p, 2)]
+
+def grade_pivot(group_df):
+    """
+    One row per register number and one column per subject, holding the first
+    grade seen, with '-' where the student has no entry.
+    """
+    return (group_df.drop_duplicates(['Register No', 'Subject'])
+            .pivot(index='Register No', columns='Subject', values='Grade')
+            # Categorical columns can carry students/subjects from other groups
+            .dropna(how='all')
+            .dropna(axis=1, how='all')
+            .sort_index()
+            .sort_index(axis=1)
+            .astype(object)
+            .fillna('-'))
+
+def group_pivots(df):
+    """Yields (sheet_name, grade_pivot) for every Dept/Year group from a single groupby pass."""
+    if 'Dept' not in df.columns or 'Year' not in df.columns:
+        return
+    for (dept, year), group_df in df.groupby(['Dept', 'Year'], sort=True, observed=True):
+        yield f"{dept}_{year}"[:31], grade_pivot(group_df)
+
+def _header(ws, values):
+    row = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = Font(bold=True)
+        row.append(cell)
+    ws.append(row)
+
+def write_frame_sheet(wb, title, df):
+    ws = wb.create_sheet(title)
+    _header(ws, list(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        ws.append(row)
+
+def write_pivot_sheet(wb, title, pivot_df):
+    ws = wb.create_sheet(title)
+    _header(ws, ['Register No', *pivot_df.columns.tolist()])
+    for reg_no, row in zip(pivot_df.index.tolist(), pivot_df.itertuples(index=False, name=None)):
+        ws.append([reg_no, *row])
+
+def write_sgpa_sheets(wb, sgpa_df, distribution):
+    """Adds 'SGPA Ranks' (one row per student) and 'SGPA Distribution' (per Dept/Year) sheets."""
+    ws = wb.create_sheet('SGPA Ranks')
+    _header(ws, ['Register No', *sgpa_df.columns.tolist()])
+    for reg_no, row in zip(sgpa_df.index.tolist(), sgpa_df.itertuples(index=False, name=None)):
+        ws.append([reg_no, *row])
+
+    ws = wb.create_sheet('SGPA Distribution')
+    bands = next((list(summary['bands']) for years in distribution.values() for summary in years.values()), [])
+    _header(ws, SGPA_DISTRIBUTION_COLUMNS + [f"SGPA {band}" for band in bands])
+    for dept, years in distribution.items():
+        for year, summary in years.items():
+            ws.append([dept, year, summary['students'], summary['mean'], summary['median'], summary['min'],
+                       summary['max'], summary['passed_all'], *summary['bands'].values()])
+
+def write_analysis_workbook(df, stats, excel_path, sgpa=None):
+    """
+    Writes the analysis workbook: 'All Results', 'Summary Analytics' and one
+    pivot sheet per Dept/Year, plus the SGPA sheets when sgpa is given as
+    (compute_sgpa DataFrame, sgpa_distribution). Uses openpyxl's write-only
+    mode, which streams rows to disk as they are appended, so memory stays
+    flat however large the result is.
+    """
+    wb = Workbook(write_only=True)
+
+    write_frame_sheet(wb, 'All Results', df)
+
+    summary = list(summary_rows(stats))
+    if summary:
+        ws = wb.create_sheet('Summary Analytics')
+        _header(ws, SUMMARY_COLUMNS)
+        for row in summary:
+            ws.append(row)
+
+    if sgpa is not None:
+        write_sgpa_sheets(wb, *sgpa)
+
+    for sheet_name, pivot_df in group_pivots(df):
+        write_pivot_sheet(wb, sheet_name, pivot_df)
+
+    wb.save(excel_path)
@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while every worker and queue slot is taken."""
+
+# Job attributes written to the shared status file
+STATUS_FIELDS = ['id', 'user_id', 'state', 'stage', 'pages_done', 'pages_total', 'unit', 'error', 'result',
+                 'created', 'started', 'parse_started', 'finished', 'files']
+
+# Progress callbacks rewrite the status file at most this often
+STATUS_WRITE_INTERVAL = 0.5
+
+class Job:
+    """
+    Progress of one background analysis, as reported by the status endpoint.
+
+    With a status_path the job also mirrors its status to a JSON file, so any
+    worker process of the app can answer status polls for it.
+    """
+
+    def __init__(self, user_id, status_path=None):
+        self.id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.state = 'queued'  # queued -> running -> done | failed
+        self.stage = 'queued'
+        self.pages_done = 0
+        self.pages_total = None
+        self.unit = 'pages'  # what pages_done counts; batch jobs count files
+        self.error = None
+        self.result = None
+        self.created = time.time()
+        self.started = None
+        self.parse_started = None
+        self.finished = None
+        self.files = []  # paths the job works on, kept from the storage sweeper until it finishes
+        self.status_path = status_path
+        self._saved = 0
+
+    @classmethod
+    def load(cls, status_path):
+        """Job as last written to status_path by another process, or None."""
+        try:
+            with open(status_path) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+        job = cls(status['user_id'])
+        for field in STATUS_FIELDS:
+            setattr(job, field, status.get(field))
+        return job
+
+    def save(self, force=True):
+        if self.status_path is None or (not force and time.time() - self._saved < STATUS_WRITE_INTERVAL):
+            return
+        self._saved = time.time()
+        tmp = f"{self.status_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({field: getattr(self, field) for field in STATUS_FIELDS}, f)
+            os.replace(tmp, self.status_path)
+        except OSError as e:
+            print(f"Error writing job status {self.id}: {e}")
+
+    def set_stage(self, stage):
+        self.stage = stage
+        self.save()
+
+    def progress(self, pages_done, pages_total):
+        """Callback handed to process_pdf, called as pages (or batch files) are parsed."""
+        if self.parse_started is None:
+            self.parse_started = time.time()
+        self.pages_done = pages_done
+        self.pages_total = pages_total
+        self.save(force=pages_done == pages_total)
+
+    def eta(self):
+        """Seconds left in the parse stage, estimated from the page rate so far."""
+        if self.state != 'running' or not self.pages_total or not self.pages_done:
+            return None
+        elapsed = time.time() - self.parse_started
+        return round(elapsed / self.pages_done * (self.pages_total - self.pages_done), 1)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'state': self.state,
+            'stage': self.stage,
+            'pages_done': self.pages_done,
+            'pages_total': self.pages_total,
+            'unit': self.unit,
+            'eta_seconds': self.eta(),
+            'error': self.error,
+        }
+
+class JobQueue:
+    """
+    Bounded pool of background workers for PDF analyses.
+
+    At most `workers` jobs run at once and at most `max_pending` more wait for a
+    free worker; anything beyond that is rejected with QueueFull instead of
+    queueing without limit. Finished jobs are kept for `keep_seconds` so their
+    status can still be polled.
+
+    When the app runs as several processes each has its own queue, so the
+    limits apply per process. Give them a shared status_dir and a job's status
+    can be polled through any of them.
+    """
+
+    def __init__(self, workers=2, max_pending=8, keep_seconds=3600, status_dir=None):
+        self.capacity = workers + max_pending
+        self.keep_seconds = keep_seconds
+        self.status_dir = status_dir
+        if status_dir:
+            os.makedirs(status_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis')
+        self._jobs = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, func, *args, files=()):
+        """
+        Queues func(job, *args). Its return value becomes job.result.
+        files are the paths the job reads, such as received PDFs, which
+        active_files() reports until the job finishes.
+        """
+        job = Job(user_id)
+        job.files = list(files)
+        with self._lock:
+            self._prune()
+            if self._active >= self.capacity:
+                raise QueueFull()
+            self._active += 1
+            self._jobs[job.id] = job
+        job.status_path = self._status_path(job.id)
+        job.save()
+        self._executor.submit(self._run, job, func, args)
+        return job
+
+    def get(self, job_id, user_id=None):
+        job = self._jobs.get(job_id)
+        if job is None and self.status_dir:
+            status_path = self._status_path(job_id)
+            job = status_path and Job.load(status_path)
+        if job is None or (user_id is not None and job.user_id != user_id):
+            return None
+        return job
+
+    def active_files(self):
+        """
+        Paths of the files of queued and running jobs, in every process that
+        shares status_dir (only this one's without it).
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if self.status_dir:
+            for name in os.listdir(self.status_dir):
+                if name.endswith('.json'):
+                    job = Job.load(os.path.join(self.status_dir, name))
+                    if job is not None:
+                        jobs.append(job)
+        return {path for job in jobs if job.state in ('queued', 'running') for path in job.files or ()}
+
+    def _status_path(self, job_id):
+        if not self.status_dir:
+            return None
+        try:
+            uuid.UUID(job_id)
+        except ValueError:
+            return None
+        return os.path.join(self.status_dir, f"{job_id}.json")
+
+    def _run(self, job, func, args):
+        job.state = 'running'
+        job.started = time.time()
+        job.save()
+        try:
+            job.result = func(job, *args)
+            job.state = 'done'
+            job.stage = 'done'
+        except Exception as e:
+            print(f"Error in background job {job.id}: {e}")
+            job.error = str(e)
+            job.state = 'failed'
+        finally:
+            job.finished = time.time()
+            job.save()
+            with self._lock:
+                self._active -= 1
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished < cutoff]:
+            del self._jobs[job_id]
+        if self.status_dir:
+            # Jobs of every process, including ones that exited mid-job
+            for name in os.listdir(self.status_dir):
+                path = os.path.join(self.status_dir, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,180 @@
+import atexit
+import heapq
+import itertools
+import queue
+import threading
+import time
+from email.message import EmailMessage
+
+from utils.metrics import REGISTRY, Counter
+
+MAILS_TOTAL = REGISTRY.register(Counter(
+    'ktu_mails_total', 'Emails handled by the outbox, by outcome.', labelnames=('outcome',)))
+
+class Outbox:
+    """
+    Background queue that delivers email over one reused SMTP connection.
+
+    send() only queues the message, so a request never waits on the mail
+    server. A worker thread, started on the first send, takes up to
+    batch_size queued messages at a time and sends them over a connection
+    that stays open until it has been idle for idle_timeout seconds.
+    Connection errors and temporary (4xx) SMTP failures are retried up to
+    max_retries times, waiting retry_delay * 2**attempt seconds in between;
+    permanent (5xx) failures are dropped. Messages still queued when the
+    process exits are lost, after a short flush attempt.
+    """
+
+    def __init__(self, server, port, username=None, password=None, use_tls=False, use_ssl=False,
+                 default_sender=None, timeout=10, batch_size=20, max_retries=5, retry_delay=2.0,
+                 idle_timeout=60):
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.default_sender = default_sender
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue()
+        self._delayed = []  # heap of (due, sequence, attempts, message) awaiting a retry
+        self._sequence = itertools.count()
+        self._connection = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def send(self, subject, recipients, body, sender=None):
+        """
+        Queues a plain text email and returns at once. The message is built on
+        the worker thread, so this costs the caller next to nothing.
+        """
+        self._start()
+        self._queue.put((0, (subject, recipients, body, sender)))
+
+    def _message(self, subject, recipients, body, sender):
+        message = EmailMessage()
+        message['Subject'] = subject
+        message['From'] = sender or self.default_sender or self.username
+        message['To'] = ', '.join(recipients)
+        message.set_content(body)
+        return message
+
+    def flush(self, timeout=None):
+        """Waits until every queued message is sent or given up on. Returns False on timeout."""
+        deadline = timeout is not None and time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline and deadline - time.monotonic()
+                if deadline and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining or None)
+        return True
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='mail-outbox', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush, 5)
+
+    def _run(self):
+        # This thread is the only sender, so nothing may end it
+        while True:
+            try:
+                batch = self._next_batch()
+                if not batch:
+                    self._disconnect()  # idle
+                    continue
+                for attempts, message in batch:
+                    self._deliver(attempts, message)
+            except Exception as e:
+                print(f"Error in mail outbox: {e}")
+
+    def _next_batch(self):
+        """Up to batch_size messages: retries that are due first, then newly queued ones."""
+        batch = []
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now and len(batch) < self.batch_size:
+            _, _, attempts, message = heapq.heappop(self._delayed)
+            batch.append((attempts, message))
+        wait = self.idle_timeout
+        if self._delayed:
+            wait = min(wait, max(self._delayed[0][0] - now, 0))
+        try:
+            batch.append(self._queue.get(timeout=wait) if not batch else self._queue.get_nowait())
+        except queue.Empty:
+            return batch
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _deliver(self, attempts, message):
+        """Sends one message. Always settles it: sent, queued for a retry, or counted as failed."""
+        import smtplib
+        recipients = ', '.join(message[1]) if isinstance(message, tuple) else message['To']
+        try:
+            if isinstance(message, tuple):
+                message = self._message(*message)
+            self._connect().send_message(message)
+        except smtplib.SMTPRecipientsRefused as e:
+            error, retry = e, False
+        except smtplib.SMTPResponseException as e:
+            error, retry = e, 400 <= e.smtp_code < 500
+        except (smtplib.SMTPException, OSError) as e:
+            # The connection is unusable; the retry opens a new one
+            self._disconnect()
+            error, retry = e, True
+        except Exception as e:
+            # Such as a header that fails validation; retrying will not help.
+            # The connection may be mid-transaction, so it is not reused
+            self._disconnect()
+            error, retry = e, False
+        else:
+            MAILS_TOTAL.inc(outcome='sent')
+            self._queue.task_done()
+            return
+
+        if retry and attempts < self.max_retries:
+            # Stays unfinished in the queue's count until it is sent or dropped
+            MAILS_TOTAL.inc(outcome='retried')
+            due = time.monotonic() + self.retry_delay * 2 ** attempts
+            heapq.heappush(self._delayed, (due, next(self._sequence), attempts + 1, message))
+            return
+        MAILS_TOTAL.inc(outcome='failed')
+        print(f"Error sending email to {recipients!r}: {error}")
+        self._queue.task_done()
+
+    def _connect(self):
+        import smtplib
+        if self._connection is not None:
+            return self._connection
+        if self.use_ssl:
+            connection = smtplib.SMTP_SSL(self.server, self.port, timeout=self.timeout)
+        else:
+            connection = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                connection.starttls()
+            if self.username and self.password:
+                connection.login(self.username, self.password)
+        except Exception:
+            connection.close()
+            raise
+        self._connection = connection
+        return connection
+
+    def _disconnect(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.quit()
+        except Exception:
+            self._connection.close()
+        self._connection = None
@@ -0,0 +1,334 @@
+import atexit
+import cProfile
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Upper bounds of the histogram buckets, Prometheus style (+Inf is implied)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+COUNT_BUCKETS = (100, 1000, 10000, 50000, 100000, 500000, 1000000)
+BYTES_BUCKETS = tuple(mb * 1024 * 1024 for mb in (64, 128, 256, 512, 1024, 2048, 4096))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _label_text(labelnames, values):
+    if not labelnames:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)) + '}'
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(total, value):
+        return total + value
+
+    def render(self, values=None):
+        """Text format lines for values ({label values: count}), this process's own when None."""
+        values = self.snapshot() if values is None else values
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for key, value in sorted(values.items()):
+            lines.append(f'{self.name}{_label_text(self.labelnames, key)} {_number(value)}')
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in the Prometheus text format."""
+
+    def __init__(self, name, help, buckets=SECONDS_BUCKETS, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    @staticmethod
+    def merge(total, series):
+        return [a + b for a, b in zip(total, series)]
+
+    def render(self, values=None):
+        """Text format lines for values ({label values: series}), this process's own when None."""
+        values = self.snapshot() if values is None else values
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, series in sorted(values.items()):
+            for bound, count in zip(self.buckets, series):
+                labels = _label_text(self.labelnames + ('le',), key + (_number(bound),))
+                lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _label_text(self.labelnames + ('le',), key + ('+Inf',))
+            lines.append(f'{self.name}_bucket{labels} {series[-1]}')
+            labels = _label_text(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_number(series[-2])}')
+            lines.append(f'{self.name}_count{labels} {series[-1]}')
+        return lines
+
+class Registry:
+    """
+    The metrics of the app. After share(), every process writes its values
+    to its own file in a shared directory, and render() reports the sum over
+    all of them, so a scrape answered by any worker sees the same totals.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self.directory = None
+        self._path = None
+        self._pid = None
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def share(self, directory, interval=5):
+        """
+        Writes this process's values to directory every interval seconds, on
+        exit and before each render(). Files of exited processes are kept, so
+        totals do not drop when a worker is replaced; clear_shared() resets
+        them when the server starts.
+        """
+        if self._flusher is not None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        # The pid alone could be reused by a later worker and overwrite a finished one's totals
+        self._pid = os.getpid()
+        self._path = os.path.join(directory, f"{self._pid}_{uuid.uuid4().hex[:8]}.json")
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Error writing metrics to {directory}: {e}")
+
+        self._flusher = threading.Thread(target=run, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def flush(self):
+        """Writes this process's values to its file in the shared directory."""
+        # Processes forked from a sharing one do not own its file
+        if self._path is None or os.getpid() != self._pid:
+            return
+        values = {metric.name: [[list(key), value] for key, value in metric.snapshot().items()]
+                  for metric in self._metrics}
+        with self._flush_lock:
+            tmp = f"{self._path}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(values, f)
+            os.replace(tmp, self._path)
+
+    def _shared_values(self):
+        """Returns {metric name: {label values: value}} summed over every process's file."""
+        metrics = {metric.name: metric for metric in self._metrics}
+        totals = {name: {} for name in metrics}
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    values = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric_name, series in values.items():
+                metric = metrics.get(metric_name)
+                if metric is None:
+                    continue
+                total = totals[metric_name]
+                for key, value in series:
+                    key = tuple(key)
+                    total[key] = metric.merge(total[key], value) if key in total else value
+        return totals
+
+    def render(self):
+        values = {}
+        if self._path is not None:
+            self.flush()
+            values = self._shared_values()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(values.get(metric.name)))
+        return '\n'.join(lines) + '\n'
+
+def clear_shared(directory):
+    """Removes the per-process files share() writes, resetting the shared totals."""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        if name.endswith('.json') or name.endswith('.tmp'):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+REGISTRY = Registry()
+
+UPLOAD_STAGE_SECONDS = REGISTRY.register(Histogram(
+    'ktu_upload_stage_seconds', 'Time spent in each stage of an upload analysis.',
+    labelnames=('kind', 'stage')))
+UPLOAD_SECONDS = REGISTRY.register(Histogram(
+    'ktu_upload_seconds', 'Total time of an upload analysis, from saving the file to the history entry.',
+    labelnames=('kind', 'outcome')))
+UPLOAD_PAGES_PER_SECOND = REGISTRY.register(Histogram(
+    'ktu_upload_pages_per_second', 'PDF pages parsed per second of the parse stage.',
+    buckets=RATE_BUCKETS, labelnames=('kind',)))
+UPLOAD_ROWS = REGISTRY.register(Histogram(
+    'ktu_upload_rows', 'Result rows (student x subject) produced by an upload.',
+    buckets=COUNT_BUCKETS, labelnames=('kind',)))
+UPLOAD_PEAK_RSS_BYTES = REGISTRY.register(Histogram(
+    'ktu_upload_peak_rss_bytes', 'Highest resident memory of the app process seen during an upload.',
+    buckets=BYTES_BUCKETS, labelnames=('kind',)))
+UPLOADS_TOTAL = REGISTRY.register(Counter(
+    'ktu_uploads_total', 'Upload analyses finished, by outcome.', labelnames=('kind', 'outcome')))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'ktu_http_request_seconds', 'Time to handle an HTTP request, by endpoint.',
+    labelnames=('endpoint', 'method')))
+
+def current_rss_bytes():
+    """Resident memory of this process right now (peak so far where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return 0
+
+class StageTimer:
+    """
+    Collects the stage durations of one upload analysis and, on finish(),
+    records them in the histograms above and optionally as one JSON log line.
+
+    Memory is sampled at every stage boundary, so peak_rss is the highest
+    reading seen at those points rather than a true high-water mark.
+    """
+
+    def __init__(self, kind='upload', log=False):
+        self.kind = kind
+        self.log = log
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.pages = 0
+        self.parse_seconds = None
+        self.rows = 0
+        self.peak_rss = current_rss_bytes()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0) + seconds
+        self.peak_rss = max(self.peak_rss, current_rss_bytes())
+
+    def add_all(self, timings):
+        """Adds a {stage: seconds} dict, such as the one process_pdf fills in."""
+        for name, seconds in timings.items():
+            self.add(name, seconds)
+
+    def finish(self, outcome, **fields):
+        total = time.perf_counter() - self.started
+        for name, seconds in self.stages.items():
+            UPLOAD_STAGE_SECONDS.observe(seconds, kind=self.kind, stage=name)
+        UPLOAD_SECONDS.observe(total, kind=self.kind, outcome=outcome)
+        UPLOADS_TOTAL.inc(kind=self.kind, outcome=outcome)
+        pages_per_second = None
+        if outcome == 'done':
+            if self.pages and self.parse_seconds:
+                pages_per_second = self.pages / self.parse_seconds
+                UPLOAD_PAGES_PER_SECOND.observe(pages_per_second, kind=self.kind)
+            UPLOAD_ROWS.observe(self.rows, kind=self.kind)
+            UPLOAD_PEAK_RSS_BYTES.observe(self.peak_rss, kind=self.kind)
+
+        if self.log:
+            print(json.dumps({
+                'event': 'upload_metrics',
+                'kind': self.kind,
+                'outcome': outcome,
+                'seconds': round(total, 4),
+                'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                'pages': self.pages,
+                'pages_per_second': pages_per_second and round(pages_per_second, 2),
+                'rows': self.rows,
+                'peak_rss_mb': round(self.peak_rss / (1024 * 1024), 1),
+                **fields,
+            }), flush=True)
+        return total
+
+# cProfile can only profile one thread at a time, so one upload is profiled at once
+_profile_lock = threading.Lock()
+
+@contextmanager
+def profile_if_slow(dump_path, min_seconds):
+    """
+    Profiles the wrapped block with cProfile and writes the stats to dump_path
+    when it took at least min_seconds. Does nothing when min_seconds is None
+    or another upload is already being profiled. Only the calling thread is
+    profiled; pages parsed in worker processes show up as waiting time.
+    """
+    if min_seconds is None or not _profile_lock.acquire(blocking=False):
+        yield
+        return
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profile_lock.release()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            os.makedirs(os.path.dirname(dump_path), exist_ok=True)
+            profiler.dump_stats(dump_path)
+            print(f"Slow upload ({elapsed:.1f}s) profiled to {dump_path}")
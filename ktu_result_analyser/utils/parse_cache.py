@@ -0,0 +1,123 @@
+import hashlib
+import os
+
+class ParseCache:
+    """
+    Content-addressed cache of parsed result PDFs.
+
+    Entries are keyed by a SHA-256 of the uploaded bytes, the parser version
+    and the text extraction backend, since backends may not agree on a PDF.
+    Each entry is the parsed DataFrame as a Feather file plus the generate_stats
+    output as JSON. Total size is bounded with least-recently-used eviction,
+    using file mtimes as the access clock.
+
+    The analysis modules are imported on first use, not with this module, so
+    creating the cache at startup stays cheap.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key_for(pdf_path, backend=None):
+        """
+        Key of a PDF parsed with the given backend (DEFAULT_BACKEND when None).
+        Hashes the file in chunks so large uploads are never fully in memory.
+        """
+        from utils.pdf_processor import DEFAULT_BACKEND, PARSER_VERSION
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return f"v{PARSER_VERSION}_{backend or DEFAULT_BACKEND}_{digest.hexdigest()}"
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.feather', base + '.json'
+
+    def get(self, key):
+        """Returns (df, stats) for a cached upload, or None on a miss."""
+        from utils.analysis_store import read_results
+        frame_path, stats_path = self._paths(key)
+        try:
+            df, stats = read_results(frame_path, stats_path)
+        except (OSError, ValueError):
+            return None
+
+        # Mark as recently used
+        for path in (frame_path, stats_path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return df, stats
+
+    def put(self, key, df, stats):
+        from utils.analysis_store import write_results
+        try:
+            write_results(*self._paths(key), df, stats)
+        except Exception as e:
+            print(f"Error writing parse cache entry: {e}")
+            return
+        self.evict()
+
+    def put_batches(self, key, batches):
+        """
+        Streams parsed result batches (see iter_result_batches) straight into
+        a new entry, without building the DataFrame first. Returns (df, stats)
+        read back from the entry, or None when the batches hold no rows.
+        Errors from the batches are raised to the caller.
+        """
+        from utils.analysis_store import read_results, write_result_batches
+        frame_path, stats_path = self._paths(key)
+        if write_result_batches(frame_path, stats_path, batches) is None:
+            return None
+        result = read_results(frame_path, stats_path)
+        self.evict()
+        return result
+
+    def _entries(self):
+        """Returns {key: (last_used, total_bytes)} for every stored entry."""
+        entries = {}
+        for name in os.listdir(self.directory):
+            if name.startswith('.'):
+                continue
+            key, _ = os.path.splitext(name)
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            last_used, size = entries.get(key, (0, 0))
+            entries[key] = (max(last_used, st.st_mtime), size + st.st_size)
+        return entries
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self):
+        """Drops least recently used entries until the cache fits in max_bytes."""
+        entries = self._entries()
+        total = sum(size for _, size in entries.values())
+        for key, (_, size) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+
+    def invalidate(self, all_versions=False):
+        """
+        Removes entries written by other parser versions, or every entry when
+        all_versions is set. Called at startup so a change to the parsing rules
+        (and a bump of PARSER_VERSION) never serves stale results.
+        """
+        from utils.pdf_processor import PARSER_VERSION
+        current = f"v{PARSER_VERSION}_"
+        for key in self._entries():
+            if all_versions or not key.startswith(current):
+                self._remove(key)
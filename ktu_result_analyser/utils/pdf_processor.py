@@ -1,127 +1,855 @@
 import pdfplumber
+import multiprocessing
+import numpy as np
+import os
 import pandas as pd
 import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 
-def process_pdf(pdf_path):
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# Bump whenever the parsing rules change so cached parses are invalidated
+PARSER_VERSION = 4
+
+# KTU Register Number Format: <CollegeCode><Year><DeptCode><RollNo>
+# Group 1: Full Reg No
+# Group 2: College Code (3 chars)
+# Group 3: Year (2 digits)
+# Group 4: Dept Code (2-3 chars, e.g., CS, AD, CHE)
+# Group 5: Roll No (3 digits)
+REG_NO_RE = re.compile(r'\b(([A-Z]{3})(\d{2})([A-Z]{2,3})(\d{3}))\b')
+
+# Matches: CODE(GRADE) e.g., MAT203(F) or CST203(Absent)
+COURSE_RE = re.compile(r'([A-Z]{3}\d{3})\(([\w\+]+)\)')
+
+# Filter for specific departments only: CS, CE, EE, EC, ME, AI/AD
+# EEE corresponds to EE, ECE corresponds to EC
+ALLOWED_DEPTS = frozenset({'CS', 'CE', 'EE', 'EC', 'ME', 'AI', 'AD'})
+
+# Grades counted as a fail in the statistics
+FAIL_GRADES = ['F', 'FE', 'Absent']
+
+# Columns stored as pandas categoricals in a compact results DataFrame
+CATEGORICAL_COLUMNS = ['Register No', 'Year', 'Dept', 'Subject', 'Grade']
+
+# Below this many pages the cost of spawning workers outweighs the gain
+# (pdfplumber; the pdfium backend is fast enough to need far more pages)
+PARALLEL_MIN_PAGES = 8
+
+# Pages parsed into each DataFrame iter_result_batches yields
+STREAM_BATCH_PAGES = 50
+
+# Temporary directories of the page slices parsed in parallel by iter_result_batches
+SLICE_DIR_PREFIX = '.slices_'
+
+class ResultColumns:
+    """
+    Column buffers the scanner appends parsed rows to.
+    Each register number is interned once into a student table holding its
+    decoded year and dept; rows only store the student's integer code next
+    to the subject and grade.
+    """
+
+    def __init__(self):
+        self.reg_nos = []
+        self.years = []
+        self.depts = []
+        self._codes = {}
+        self.student = []
+        self.subjects = []
+        self.grades = []
+
+    def __len__(self):
+        return len(self.student)
+
+    def intern(self, reg_no, year, dept):
+        """Returns the student code for a register number, or None when the dept is filtered out."""
+        if dept not in ALLOWED_DEPTS:
+            return None
+        code = self._codes.get(reg_no)
+        if code is None:
+            code = self._codes[reg_no] = len(self.reg_nos)
+            self.reg_nos.append(reg_no)
+            self.years.append(year)
+            self.depts.append(dept)
+        return code
+
+    def intern_reg_no(self, reg_no):
+        reg_match = REG_NO_RE.fullmatch(reg_no)
+        return self.intern(reg_no, f"20{reg_match.group(3)}", reg_match.group(4))
+
+    def add(self, code, courses):
+        """Appends (subject, grade) pairs for one student."""
+        if not courses:
+            return
+        self.student.extend([code] * len(courses))
+        subjects, grades = zip(*courses)
+        self.subjects.extend(subjects)
+        self.grades.extend(grades)
+
+    def extend(self, other):
+        """Appends another buffer's rows, remapping its student codes into this one."""
+        remap = [self.intern(reg_no, year, dept) for reg_no, year, dept in zip(other.reg_nos, other.years, other.depts)]
+        self.student.extend([remap[code] for code in other.student])
+        self.subjects.extend(other.subjects)
+        self.grades.extend(other.grades)
+
+    def to_frame(self):
+        """Builds the results DataFrame with categorical columns."""
+        student = np.asarray(self.student, dtype=np.int32)
+        columns = {}
+        for name, per_student in (('Register No', self.reg_nos), ('Year', self.years), ('Dept', self.depts)):
+            codes, categories = pd.factorize(pd.Index(per_student), sort=True)
+            columns[name] = pd.Categorical.from_codes(codes[student], categories=categories)
+        columns['Subject'] = pd.Categorical(self.subjects)
+        columns['Grade'] = pd.Categorical(self.grades)
+        return pd.DataFrame(columns)
+
+def _scan_page(text, student, rows, orphans=None):
+    """
+    Single pass scanner over one page of text.
+    Register numbers are located with one scan of the page; a register number
+    takes effect from the start of the line it is found on (only the first one
+    on a line counts) and carries over to later lines and pages. Course tokens
+    are then collected per student segment.
+    Args:
+        text: Extracted page text.
+        student: (code, reg_no) of the student in effect from earlier pages,
+                 with code None for a filtered dept, or None if no register
+                 number has been seen yet.
+        rows: ResultColumns that parsed rows are appended to.
+        orphans: When given, course tokens seen while `student` is None are
+                 collected here so the caller can attribute them later.
+    Returns:
+        The (code, reg_no) student in effect after the page.
+    """
+    # Register numbers keyed by the offset of the line they start on;
+    # year and dept are decoded once per student when it is interned
+    starts = []
+    students = []
+    for reg_match in REG_NO_RE.finditer(text):
+        line_start = text.rfind('\n', 0, reg_match.start()) + 1
+        if not starts or starts[-1] != line_start:
+            starts.append(line_start)
+            reg_no = reg_match.group(1)
+            # Assuming 20xx
+            students.append((rows.intern(reg_no, f"20{reg_match.group(3)}", reg_match.group(4)), reg_no))
+
+    # Pages without a single CODE(GRADE) token only update the carried student
+    if '(' not in text:
+        return students[-1] if students else student
+
+    # Each student owns the text from its line start up to the next student;
+    # segments of filtered depts are never scanned for courses
+    bounds = starts + [len(text)]
+    segments = [(student, 0, bounds[0])] + [(students[i], bounds[i], bounds[i + 1]) for i in range(len(starts))]
+    for owner, seg_start, seg_end in segments:
+        if owner is None:
+            if orphans is not None:
+                orphans.extend(COURSE_RE.findall(text, seg_start, seg_end))
+        elif owner[0] is not None:
+            rows.add(owner[0], COURSE_RE.findall(text, seg_start, seg_end))
+
+    return students[-1] if students else student
+
+class PdfplumberBackend:
+    """Reference text extraction: pdfplumber's layout-aware extract_text()."""
+
+    name = 'pdfplumber'
+    parallel_min_pages = PARALLEL_MIN_PAGES
+
+    def __init__(self, pdf_path):
+        self._pdf = pdfplumber.open(pdf_path)
+
+    def __len__(self):
+        return len(self._pdf.pages)
+
+    def page_text(self, index):
+        # Pages are never revisited, so their layout caches are dropped at once
+        # instead of accumulating for the life of the document
+        page = self._pdf.pages[index]
+        try:
+            return page.extract_text()
+        finally:
+            page.close()
+
+    def close(self):
+        self._pdf.close()
+
+# pdfium is not thread safe, and analyses run on several job threads
+_pdfium_lock = threading.RLock()
+
+# Points within which text pieces share a line, and beyond which a gap on a
+# line is a space; pdfplumber's default y/x tolerances
+LINE_TOLERANCE = 3
+
+class PdfiumBackend:
+    """
+    Fast text extraction from pdfium's text page, without the per-character
+    Python objects pdfplumber builds.
+    pdfium returns text in the order the PDF draws it, which for tables drawn
+    a column at a time separates register numbers from their grades. Lines
+    are therefore rebuilt from the positions of pdfium's text rectangles
+    (runs of text on one line): grouped by their top edge, ordered left to
+    right, and joined with a space wherever there is a gap, as pdfplumber does.
+    """
+
+    name = 'pdfium'
+    parallel_min_pages = 1000
+
+    def __init__(self, pdf_path):
+        if pdfium is None:
+            raise ImportError("pypdfium2 is required for the pdfium backend")
+        with _pdfium_lock:
+            self._pdf = pdfium.PdfDocument(pdf_path)
+
+    def __len__(self):
+        return len(self._pdf)
+
+    def page_text(self, index):
+        with _pdfium_lock:
+            page = self._pdf[index]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    text = self._layout_text(textpage)
+                finally:
+                    textpage.close()
+            finally:
+                page.close()
+        return text
+
+    @staticmethod
+    def _layout_text(textpage):
+        # (left, bottom, right, top) in PDF units, y growing up the page
+        rects = sorted((textpage.get_rect(i) for i in range(textpage.count_rects())), key=lambda r: (-r[3], r[0]))
+        lines = []
+        for rect in rects:
+            if lines and lines[-1][0] - rect[3] <= LINE_TOLERANCE:
+                lines[-1][1].append(rect)
+            else:
+                lines.append((rect[3], [rect]))
+
+        out = []
+        for _, line in lines:
+            parts = []
+            right = None
+            for rect in sorted(line):
+                if right is not None and rect[0] - right > LINE_TOLERANCE:
+                    parts.append(' ')
+                parts.append(textpage.get_text_bounded(*rect).replace('\r', '').replace('\n', ' '))
+                right = rect[2]
+            out.append(''.join(parts))
+        return '\n'.join(out)
+
+    def close(self):
+        with _pdfium_lock:
+            self._pdf.close()
+
+# Text extraction backends by name, selectable with process_pdf(backend=...)
+BACKENDS = {backend.name: backend for backend in (PdfplumberBackend, PdfiumBackend)}
+REFERENCE_BACKEND = PdfplumberBackend.name
+# pdfium is opt-in (PDF_BACKEND=pdfium) until it has matched pdfplumber on
+# real university PDFs, not only on bench_extractors' synthetic ones
+DEFAULT_BACKEND = REFERENCE_BACKEND
+
+class PageTexts:
+    """
+    Page text of one PDF from the chosen backend. A page the backend fails on
+    (an exception, or text without a single CODE(GRADE) token) is extracted
+    again with the reference backend, which is only opened if needed.
+    """
+
+    def __init__(self, pdf_path, backend=None):
+        backend = backend or DEFAULT_BACKEND
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown PDF backend '{backend}', expected one of {', '.join(BACKENDS)}")
+        self.pdf_path = pdf_path
+        self.backend = backend
+        self.fallback_pages = 0
+        self._fallback = None
+        try:
+            self._backend = BACKENDS[backend](pdf_path)
+        except Exception as e:
+            if backend == REFERENCE_BACKEND:
+                raise
+            print(f"Error opening PDF with {backend}, using {REFERENCE_BACKEND}: {e}")
+            self._backend = PdfplumberBackend(pdf_path)
+
+    def __len__(self):
+        return len(self._backend)
+
+    @property
+    def parallel_min_pages(self):
+        return self._backend.parallel_min_pages
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def text(self, index):
+        if self._backend.name == REFERENCE_BACKEND:
+            return self._backend.page_text(index)
+        try:
+            text = self._backend.page_text(index)
+            if text and COURSE_RE.search(text):
+                return text
+        except Exception as e:
+            print(f"Error extracting page {index + 1} with {self._backend.name}: {e}")
+        if self._fallback is None:
+            self._fallback = PdfplumberBackend(self.pdf_path)
+        self.fallback_pages += 1
+        return self._fallback.page_text(index)
+
+    def close(self):
+        self._backend.close()
+        if self._fallback is not None:
+            self._fallback.close()
+            print(f"{self.fallback_pages} page(s) of {self.pdf_path} extracted with {REFERENCE_BACKEND} "
+                  f"after {self._backend.name} failed on them")
+
+@contextmanager
+def _open_pages(pdf, backend):
+    """PageTexts of a PDF path, or pdf itself when it is an open PageTexts (which is left open)."""
+    if isinstance(pdf, PageTexts):
+        yield pdf
+    else:
+        with PageTexts(pdf, backend) as pages:
+            yield pages
+
+def process_pool(workers):
+    """
+    ProcessPoolExecutor for parsing. Pools are started from job threads, and
+    a forked child inherits any lock another thread holds at that moment
+    (_pdfium_lock, or one inside a library) and waits on it forever. Workers
+    are therefore forked from a single-threaded forkserver that has this
+    module preloaded, or spawned where forkserver is unavailable (Windows).
+    Either way workers import the main module, which must be guarded (see
+    process_pdf); preloading it imports it once for all of them.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # Only takes effect before the server first starts
+        context.set_forkserver_preload(['__main__', __name__])
+    else:
+        context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+def _parse_page_range(pdf_path, start, stop, backend=None):
+    """
+    Worker entry point for parallel parsing. Opens the PDF independently and
+    parses pages [start, stop) without knowledge of earlier pages.
+    Returns:
+        tuple: (orphan courses seen before the first register number,
+                parsed ResultColumns, register number in effect at the end
+                of the slice or None, {stage: seconds} spent in the worker)
+    """
+    rows = ResultColumns()
+    orphans = []
+    student = None
+    timings = {'extract_text': 0.0, 'scan': 0.0}
+
+    with PageTexts(pdf_path, backend) as pages:
+        for index in range(start, stop):
+            t0 = time.perf_counter()
+            text = pages.text(index)
+            t1 = time.perf_counter()
+            timings['extract_text'] += t1 - t0
+            if not text:
+                continue
+            student = _scan_page(text, student, rows, orphans)
+            timings['scan'] += time.perf_counter() - t1
+
+    return orphans, rows, student[1] if student else None, timings
+
+def _merge_slices(results):
+    """
+    Stitches worker results back together in page order, carrying the last
+    register number of a slice into the orphan courses of the next one so the
+    output matches a serial parse.
+    """
+    merged = ResultColumns()
+    carry = None
+    for orphans, rows, reg_no, _ in results:
+        if carry and orphans:
+            code = merged.intern_reg_no(carry)
+            if code is not None:
+                merged.add(code, orphans)
+        merged.extend(rows)
+        if reg_no is not None:
+            carry = reg_no
+    return merged
+
+def _map_slices(worker, pdf_path, page_count, workers, progress, timings, *args):
+    """
+    Runs worker(pdf_path, start, stop, *args) over contiguous page slices in a
+    process pool. Returns the results in page order; the last item of each
+    result is the worker's {stage: seconds}, which is added to timings.
+    """
+    # Contiguous slices, a few per worker so uneven pages still balance out
+    chunk = max(1, -(-page_count // (workers * 4)))
+    bounds = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+
+    with process_pool(workers) as pool:
+        futures = {pool.submit(worker, pdf_path, start, stop, *args): stop - start for start, stop in bounds}
+        if progress:
+            pages_done = 0
+            for future in as_completed(futures):
+                pages_done += futures[future]
+                progress(pages_done, page_count)
+        results = [f.result() for f in futures]
+
+    if timings is not None:
+        # Summed over workers, so these can add up to more than the wall time
+        for *_, worker_timings in results:
+            for stage, seconds in worker_timings.items():
+                timings[stage] = timings.get(stage, 0) + seconds
+    return results
+
+def _parse_parallel(pdf_path, page_count, workers, progress=None, timings=None, backend=None):
+    results = _map_slices(_parse_page_range, pdf_path, page_count, workers, progress, timings, backend)
+    start = time.perf_counter()
+    merged = _merge_slices(results)
+    if timings is not None:
+        timings['merge'] = time.perf_counter() - start
+    return merged
+
+def process_pdf(pdf_path, workers=None, progress=None, timings=None, backend=None):
     """
     Parses the KTU result PDF and extracts student data.
+    Args:
+        pdf_path: Path to the result PDF, or an open PageTexts of it (whose
+                  backend is used, and which is left open).
+        workers: Number of worker processes to split the pages across.
+                 None or 1 parses serially in this process. Workers import
+                 the caller's main module, as with multiprocessing's spawn,
+                 so a script passing workers > 1 must keep its top-level
+                 code under an `if __name__ == '__main__':` guard.
+        progress: Optional callback, called as progress(pages_done, page_count).
+        timings: Optional dict that is filled with the seconds spent per stage
+                 (extract_text, scan, merge, build_frame, generate_stats).
+        backend: Name of the text extraction backend in BACKENDS, DEFAULT_BACKEND
+                 when None. Pages it fails on fall back to pdfplumber.
     Returns:
         tuple: (DataFrame of results, Dictionary of statistics)
     """
-    data = []
+    rows = ResultColumns()
+    if timings is None:
+        timings = {}
     
     # KTU Register Number Format: <CollegeCode><Year><DeptCode><RollNo>
     # Example: BMC19CS046 -> BMC (College), 19 (Year), CS (Dept), 046 (RollNo)
     # We will use this to extract Dept and Year.
     
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            current_student = None
-            current_reg_no = None
-            
-            for page in pdf.pages:
-                text = page.extract_text()
-                if not text:
-                    continue
-                
-                lines = text.split('\n')
-                for line in lines:
-                    # Regex to find Register Number with groups
-                    # Group 1: Full Reg No
-                    # Group 2: College Code (3 chars)
-                    # Group 3: Year (2 digits)
-                    # Group 4: Dept Code (2-3 chars, e.g., CS, AD, CHE)
-                    # Group 5: Roll No (3 digits)
-                    reg_match = re.search(r'\b(([A-Z]{3})(\d{2})([A-Z]{2,3})(\d{3}))\b', line)
-                    
-                    if reg_match:
-                        current_reg_no = reg_match.group(1)
-                        year = reg_match.group(3)
-                        dept = reg_match.group(4)
-                        
-                        # Set current student details
-                        current_student = "" 
-                    
-                    if current_reg_no:
-                        # Re-parse the current_reg_no to ensure we have the vars even if found in previous lines
-                        # (Though current logic assumes reg_no is found on the same line or persists)
-                        # To be safe, we re-extract from current_reg_no
-                        sub_match = re.match(r'([A-Z]{3})(\d{2})([A-Z]{2,3})(\d{3})', current_reg_no)
-                        if sub_match:
-                            year = sub_match.group(2)
-                            dept = sub_match.group(3)
-
-                        # Look for course relationships on the line
-                        # Matches: CODE(GRADE) e.g., MAT203(F) or CST203(Absent)
-                        courses = re.findall(r'([A-Z]{3}\d{3})\(([\w\+]+)\)', line)
-                        
-                        # Filter for specific departments only: CS, CE, EE, EC, ME, AI/AD
-                        # EEE corresponds to EE, ECE corresponds to EC
-                        allowed_depts = {'CS', 'CE', 'EE', 'EC', 'ME', 'AI', 'AD'}
-                        
-                        if dept in allowed_depts:
-                            for subject, grade in courses:
-                                data.append({
-                                    'Register No': current_reg_no,
-                                    'Year': f"20{year}", # Assuming 20xx
-                                    'Dept': dept,
-                                    'Name': current_student,
-                                    'Subject': subject,
-                                    'Grade': grade
-                                })
-
-        df = pd.DataFrame(data)
+        with _open_pages(pdf_path, backend) as pages:
+            pdf_path, backend = pages.pdf_path, pages.backend
+            page_count = len(pages)
+            parallel = workers and workers > 1 and page_count >= pages.parallel_min_pages
+
+            if not parallel:
+                student = None
+                timings.setdefault('extract_text', 0.0)
+                timings.setdefault('scan', 0.0)
+                for page_no in range(1, page_count + 1):
+                    t0 = time.perf_counter()
+                    text = pages.text(page_no - 1)
+                    t1 = time.perf_counter()
+                    timings['extract_text'] += t1 - t0
+                    if text:
+                        student = _scan_page(text, student, rows)
+                        timings['scan'] += time.perf_counter() - t1
+                    if progress:
+                        progress(page_no, page_count)
+
+        if parallel:
+            rows = _parse_parallel(pdf_path, page_count, min(workers, page_count), progress, timings, backend)
+
+        start = time.perf_counter()
+        df = rows.to_frame()
+        timings['build_frame'] = time.perf_counter() - start
         
         if df.empty:
             return None, None
 
+        start = time.perf_counter()
         stats = generate_stats(df)
+        timings['generate_stats'] = time.perf_counter() - start
         return df, stats
 
     except Exception as e:
         print(f"Error processing PDF: {e}")
         return None, None
 
+def _page_batches(pages, start, stop, batch_pages, timings, progress=None, orphans=None, end=None):
+    """
+    Parses pages [start, stop) of an open PageTexts, yielding the rows of
+    every batch_pages pages as a compact DataFrame; batches without rows are
+    skipped. A student whose results run across a batch boundary is carried
+    over like across a page. orphans and the (code, reg_no) student left in
+    end['student'] after the last page are as for _parse_page_range.
+    """
+    rows = ResultColumns()
+    student = None
+    for index in range(start, stop):
+        t0 = time.perf_counter()
+        text = pages.text(index)
+        t1 = time.perf_counter()
+        timings['extract_text'] += t1 - t0
+        if text:
+            student = _scan_page(text, student, rows, orphans)
+            timings['scan'] += time.perf_counter() - t1
+        if progress:
+            progress(index + 1, len(pages))
+
+        if (index + 1 - start) % batch_pages and index + 1 != stop:
+            continue
+        if len(rows):
+            t0 = time.perf_counter()
+            batch = rows.to_frame()
+            timings['build_frame'] += time.perf_counter() - t0
+            yield batch
+        # Student codes are per buffer, so the carried student is interned again
+        rows = ResultColumns()
+        if student is not None:
+            student = (rows.intern_reg_no(student[1]), student[1])
+    if end is not None:
+        end['student'] = student
+
+def _stream_page_range(pdf_path, start, stop, backend, batch_pages, slice_dir):
+    """
+    Worker entry point for parallel streaming: parses pages [start, stop) like
+    _parse_page_range, but appends the rows batch by batch to a Feather file
+    in slice_dir instead of returning them.
+    Returns:
+        tuple: (orphan courses, path of the slice file or None if it has no
+                rows, register number in effect at the end or None,
+                {stage: seconds} spent in the worker)
+    """
+    from utils.analysis_store import write_frame_batches
+    orphans = []
+    end = {}
+    timings = {'extract_text': 0.0, 'scan': 0.0, 'build_frame': 0.0}
+    frame_path = os.path.join(slice_dir, f"{start}.feather")
+    with PageTexts(pdf_path, backend) as pages:
+        rows = write_frame_batches(frame_path, _page_batches(pages, start, stop, batch_pages, timings,
+                                                             orphans=orphans, end=end))
+    student = end.get('student')
+    return orphans, frame_path if rows else None, student[1] if student else None, timings
+
+def _stream_parallel(pdf_path, page_count, workers, batch_pages, progress, timings, backend, work_dir):
+    """
+    Workers stream their page slices to files in a temporary directory, which
+    are then read back in page order one batch at a time. The orphan courses
+    of a slice go to the register number carried over from the slices
+    before it, as in _merge_slices, so the rows match a serial parse.
+    """
+    from utils.analysis_store import read_result_batches
+    with tempfile.TemporaryDirectory(prefix=SLICE_DIR_PREFIX, dir=work_dir) as slice_dir:
+        results = _map_slices(_stream_page_range, pdf_path, page_count, workers, progress, timings,
+                              backend, batch_pages, slice_dir)
+        carry = None
+        for orphans, frame_path, reg_no, _ in results:
+            if carry and orphans:
+                rows = ResultColumns()
+                code = rows.intern_reg_no(carry)
+                if code is not None:
+                    rows.add(code, orphans)
+                    yield rows.to_frame()
+            if frame_path:
+                yield from read_result_batches(frame_path)
+            if reg_no is not None:
+                carry = reg_no
+
+def iter_result_batches(pdf_path, batch_pages=STREAM_BATCH_PAGES, progress=None, timings=None, backend=None,
+                        workers=None, work_dir=None):
+    """
+    Streaming counterpart of process_pdf: yields the parsed rows as a series
+    of DataFrames of about batch_pages pages each, so only one batch of rows
+    is held at a time however long the PDF is. Concatenated, the batches hold
+    the rows process_pdf returns, in the same order; each batch has its own
+    categories (or plain strings, when parsed in parallel).
+    pdf_path, workers, progress, timings and backend are as for process_pdf. In
+    parallel, each worker writes its slice of pages to a file in a
+    SLICE_DIR_PREFIX directory under work_dir (the system temp dir when None),
+    removed once the batches are consumed.
+    """
+    if timings is None:
+        timings = {}
+    for stage in ('extract_text', 'scan', 'build_frame'):
+        timings.setdefault(stage, 0.0)
+
+    with _open_pages(pdf_path, backend) as pages:
+        pdf_path, backend = pages.pdf_path, pages.backend
+        total = len(pages)
+        parallel = workers and workers > 1 and total >= pages.parallel_min_pages
+        if not parallel:
+            yield from _page_batches(pages, 0, total, batch_pages, timings, progress)
+            return
+    yield from _stream_parallel(pdf_path, total, min(workers, total), batch_pages, progress, timings, backend, work_dir)
+
+def compact_results(df):
+    """
+    Converts a results DataFrame in the older object-dtype layout (such as
+    one read back from an exported workbook) to the compact form process_pdf
+    returns: categorical columns, and no Name column unless names are present.
+    """
+    df = df.copy()
+    if 'Name' in df.columns and not df['Name'].fillna('').astype(str).str.strip().any():
+        df = df.drop(columns='Name')
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(str).astype('category')
+    return df
+
+def merge_results(frames):
+    """
+    Combines results parsed from several PDFs into one compact DataFrame.
+    A (Register No, Subject) pair present in more than one file is kept once,
+    from the first frame it appears in.
+    """
+    # Categoricals with different categories would concat to object anyway
+    df = pd.concat([frame.astype({c: str for c in CATEGORICAL_COLUMNS if c in frame.columns}) for frame in frames],
+                   ignore_index=True)
+    df = df.drop_duplicates(['Register No', 'Subject'], keep='first', ignore_index=True)
+    return compact_results(df)
+
+def _append_rows(df, rows):
+    """Appends rows (plain string columns) to a compact DataFrame, keeping its columns categorical."""
+    rows = rows.copy()
+    for column in df.columns:
+        if column not in rows.columns:
+            rows[column] = ''
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            categories = df[column].cat.categories
+            new = pd.Index(rows[column].unique()).difference(categories)
+            if len(new):
+                categories = categories.append(new).sort_values()
+                df[column] = df[column].cat.set_categories(categories)
+            rows[column] = pd.Categorical(rows[column], categories=categories)
+    return pd.concat([df, rows[df.columns]], ignore_index=True)
+
+def upsert_results(df, update_df):
+    """
+    Applies the grades of update_df (such as a parsed revaluation PDF) to df,
+    keyed by (Register No, Subject). Pairs df already has get the new grade;
+    pairs it does not have are appended at the end.
+    Only rows of students named in the update are compared, so the work
+    beyond a vectorized filter tracks the size of the update.
+    Returns:
+        tuple: (updated compact DataFrame, DataFrame of changed rows with
+                Register No, Dept, Year, Subject, Grade, Old Grade (None for
+                appended rows) and New Student flags, in df order then
+                append order)
+    """
+    df = compact_results(df).reset_index(drop=True)
+    update = update_df[['Register No', 'Year', 'Dept', 'Subject', 'Grade']].astype(str)
+    update = update.drop_duplicates(['Register No', 'Subject'], keep='last')
+
+    candidates = df[df['Register No'].isin(update['Register No'].unique())]
+    existing = pd.DataFrame({
+        'Register No': candidates['Register No'].astype(str),
+        'Subject': candidates['Subject'].astype(str),
+        'Old Grade': candidates['Grade'].astype(str),
+        'row': candidates.index,
+    })
+    known_students = set(existing['Register No'])
+
+    matched = update.merge(existing, on=['Register No', 'Subject'], how='left')
+    matched = matched[matched['Grade'] != matched['Old Grade']]
+    regraded = matched[matched['row'].notna()].sort_values('row', kind='stable')
+    added = matched[matched['row'].isna()]
+
+    if not regraded.empty:
+        grade = df['Grade']
+        new = pd.Index(regraded['Grade'].unique()).difference(grade.cat.categories)
+        if len(new):
+            grade = grade.cat.set_categories(grade.cat.categories.append(new).sort_values())
+        else:
+            grade = grade.copy()
+        grade.iloc[regraded['row'].astype(int).to_numpy()] = regraded['Grade'].to_numpy()
+        df['Grade'] = grade
+    if not added.empty:
+        df = _append_rows(df, added[['Register No', 'Year', 'Dept', 'Subject', 'Grade']])
+
+    changed = pd.concat([regraded, added], ignore_index=True)
+    # The dept/year of a regraded row is the one already stored
+    if not regraded.empty:
+        stored = df.loc[regraded['row'].astype(int), ['Dept', 'Year']].astype(str).to_numpy()
+        changed.loc[:len(regraded) - 1, ['Dept', 'Year']] = stored
+    changed['Old Grade'] = changed['Old Grade'].astype(object).where(changed['row'].notna(), None)
+    changed['New Student'] = ~changed['Register No'].isin(known_students)
+    return df, changed.drop(columns='row')
+
+def apply_stats_delta(stats, changed):
+    """
+    Updates generate_stats output in place for the rows upsert_results changed,
+    touching only the affected Dept/Year/Subject cells and departments. The
+    result matches generate_stats on the updated DataFrame, key order included.
+    """
+    new_students = {}
+    for reg_no, dept, year, subject, grade, old_grade, new_student in changed[
+            ['Register No', 'Dept', 'Year', 'Subject', 'Grade', 'Old Grade', 'New Student']].itertuples(index=False):
+        years = stats['dept_sub_stats'].setdefault(dept, {})
+        if year not in years:
+            years[year] = {}
+            stats['dept_sub_stats'][dept] = {y: years[y] for y in sorted(years)}
+        cell = stats['dept_sub_stats'][dept][year].setdefault(subject, {'pass': 0, 'fail': 0, 'total': 0})
+        summary = stats['dept_summary'].setdefault(dept, {'count': 0, 'entries': 0})
+
+        if old_grade is None:
+            cell['total'] += 1
+            summary['entries'] += 1
+            stats['total_entries'] += 1
+            if subject not in stats['subjects']:
+                stats['subjects'].append(subject)
+            if new_student:
+                new_students[reg_no] = dept
+        else:
+            cell['fail' if old_grade in FAIL_GRADES else 'pass'] -= 1
+        cell['fail' if grade in FAIL_GRADES else 'pass'] += 1
+
+    for dept in new_students.values():
+        stats['dept_summary'][dept]['count'] += 1
+    stats['total_students'] += len(new_students)
+
+    if set(stats['dept_sub_stats']) != set(stats['departments']):
+        stats['departments'] = sorted(stats['dept_sub_stats'])
+        stats['dept_sub_stats'] = {dept: stats['dept_sub_stats'][dept] for dept in stats['departments']}
+        stats['dept_summary'] = {dept: stats['dept_summary'][dept] for dept in stats['departments']}
+    return stats
+
+class StatsAccumulator:
+    """
+    generate_stats for results that arrive as a sequence of DataFrames, such
+    as the batches iter_result_batches yields. Only the pass/fail counts per
+    Dept/Year/Subject and the register numbers seen per dept are kept, never
+    the rows, so memory tracks students and subjects rather than entries.
+    result() matches generate_stats on the concatenated batches, key order
+    included.
+    """
+
+    def __init__(self):
+        self.total_entries = 0
+        self.subjects = {}  # insertion ordered set, in order of first appearance
+        self.students = {}  # dept -> set of register numbers
+        self.cells = {}     # dept -> year -> subject -> [fail, total]
+
+    def add(self, df):
+        """Folds one batch of results into the counts."""
+        if df.empty:
+            return
+        self.total_entries += len(df)
+        self.subjects.update(dict.fromkeys(df['Subject'].unique().tolist()))
+
+        pairs = df[['Dept', 'Register No']].drop_duplicates()
+        for dept, reg_no in zip(pairs['Dept'].tolist(), pairs['Register No'].tolist()):
+            self.students.setdefault(dept, set()).add(reg_no)
+
+        # Groups of a batch come out in order of first appearance, so cells
+        # are created in the order generate_stats would see them
+        failed = df['Grade'].isin(FAIL_GRADES)
+        counts = failed.groupby([df['Dept'], df['Year'], df['Subject']], sort=False, observed=True).agg(['sum', 'count'])
+        for (dept, year, subject), fail_count, total in zip(counts.index, counts['sum'].tolist(), counts['count'].tolist()):
+            cell = self.cells.setdefault(dept, {}).setdefault(year, {}).setdefault(subject, [0, 0])
+            cell[0] += fail_count
+            cell[1] += total
+
+    def result(self):
+        """Returns the stats in the format generate_stats returns."""
+        departments = sorted(self.cells)
+        stats = {
+            'total_students': len(set().union(*self.students.values())),
+            'total_entries': self.total_entries,
+            'subjects': list(self.subjects),
+            'departments': departments,
+            'dept_sub_stats': {},
+            'dept_summary': {}
+        }
+        for dept in departments:
+            years = self.cells[dept]
+            stats['dept_sub_stats'][dept] = {
+                year: {
+                    subject: {'pass': total - fail_count, 'fail': fail_count, 'total': total}
+                    for subject, (fail_count, total) in years[year].items()
+                }
+                for year in sorted(years)
+            }
+            stats['dept_summary'][dept] = {
+                'count': len(self.students[dept]),
+                'entries': sum(total for subjects in years.values() for _, total in subjects.values())
+            }
+        return stats
+
 def generate_stats(df):
-    """Generates statistics from a results DataFrame."""
+    """
+    Generates statistics from a results DataFrame.
+    All pass/fail counts come from a single grouped aggregation over a fail
+    flag, which is then reshaped into the nested dicts the templates use.
+    df may also be an iterable of DataFrames (see iter_result_batches and
+    analysis_store.read_result_batches); those are folded in one at a time
+    with StatsAccumulator, so the full results are never in memory.
+    """
+    if not isinstance(df, pd.DataFrame):
+        accumulator = StatsAccumulator()
+        for batch in df:
+            accumulator.add(batch)
+        return accumulator.result()
+
     stats = {
-        'total_students': df['Register No'].nunique(),
+        'total_students': int(df['Register No'].nunique()),
         'total_entries': len(df),
         'subjects': df['Subject'].unique().tolist(),
         'departments': sorted(df['Dept'].unique().tolist()),
         'dept_sub_stats': {}
     }
-    
+
+    failed = df['Grade'].isin(FAIL_GRADES)
+    counts = failed.groupby([df['Dept'], df['Year'], df['Subject']], sort=False, observed=True).agg(['sum', 'count'])
+
     # Structure: stats['dept_sub_stats'][dept][year][subject] = {pass: X, fail: Y}
+    # Groups come out in order of first appearance, so subjects keep the
+    # order they appear in within each dept/year
+    nested = {}
+    for (dept, year, subject), fail_count, total in zip(counts.index, counts['sum'].tolist(), counts['count'].tolist()):
+        nested.setdefault(dept, {}).setdefault(year, {})[subject] = {
+            'pass': total - fail_count,
+            'fail': fail_count,
+            'total': total
+        }
+
     for dept in stats['departments']:
-        stats['dept_sub_stats'][dept] = {}
-        dept_df = df[df['Dept'] == dept]
-        years = sorted(dept_df['Year'].unique().tolist())
-        
-        for year in years:
-            stats['dept_sub_stats'][dept][year] = {}
-            year_df = dept_df[dept_df['Year'] == year]
-            dept_year_subjects = year_df['Subject'].unique().tolist()
-            
-            for subject in dept_year_subjects:
-                subj_df = year_df[year_df['Subject'] == subject]
-                fail_df = subj_df[subj_df['Grade'].isin(['F', 'FE', 'Absent'])]
-                pass_count = len(subj_df) - len(fail_df)
-                fail_count = len(fail_df)
-                
-                stats['dept_sub_stats'][dept][year][subject] = {
-                    'pass': pass_count,
-                    'fail': fail_count,
-                    'total': len(subj_df)
-                }
+        years = nested[dept]
+        stats['dept_sub_stats'][dept] = {year: years[year] for year in sorted(years)}
 
     # Department-wise overall stats
+    by_dept = df.groupby('Dept', observed=True)['Register No'].agg(['nunique', 'size'])
     stats['dept_summary'] = {}
-    for dept in stats['departments']:
-        dept_df = df[df['Dept'] == dept]
+    for dept, count, entries in zip(by_dept.index, by_dept['nunique'].tolist(), by_dept['size'].tolist()):
         stats['dept_summary'][dept] = {
-            'count': dept_df['Register No'].nunique(),
-            'entries': len(dept_df)
+            'count': count,
+            'entries': entries
         }
+    stats['dept_summary'] = {dept: stats['dept_summary'][dept] for dept in stats['departments']}
 
     return stats
+
+def student_counts(df):
+    """
+    Per-student pass/fail counts across all subjects.
+    Returns a DataFrame with Register No, Dept, Year, passed, failed and total.
+    """
+    failed = df['Grade'].isin(FAIL_GRADES)
+    counts = failed.groupby([df['Register No'], df['Dept'], df['Year']], sort=False, observed=True).agg(['sum', 'count'])
+    counts = counts.rename(columns={'sum': 'failed', 'count': 'total'}).reset_index()
+    counts['passed'] = counts['total'] - counts['failed']
+    return counts
@@ -0,0 +1,200 @@
+import csv
+import io
+import json
+import os
+import re
+import uuid
+
+# KTU 2019 scheme grade points, as in templates/calculator.html
+GRADE_POINTS = {
+    'S': 10, 'A+': 9, 'A': 8.5, 'B+': 8, 'B': 7.5,
+    'C+': 7, 'C': 6.5, 'D': 6, 'P': 5.5, 'F': 0, 'FE': 0, 'Absent': 0
+}
+
+# Lower edges of the one-point SGPA bands counted by sgpa_distribution (plus "<5")
+SGPA_BANDS = [5, 6, 7, 8, 9]
+
+SCHEME_NAME_RE = re.compile(r'^[\w\-. ]{1,64}$')
+SUBJECT_CODE_RE = re.compile(r'^[A-Z]{3}\d{3}$')
+
+# numpy and pandas are imported inside the SGPA functions, so managing credit
+# tables (on the index page) does not load the analysis stack
+
+def parse_credit_table(data, filename):
+    """
+    Reads a subject -> credit table from an uploaded file: JSON (an object of
+    code: credits) or CSV (code,credits rows, with or without a header).
+    Returns {subject code: credits}. Raises ValueError when the file is unusable.
+    """
+    text = data.decode('utf-8-sig') if isinstance(data, bytes) else data
+    if filename.lower().endswith('.json'):
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if not isinstance(rows, dict):
+            raise ValueError("JSON credit tables must be an object of subject code to credits")
+        rows = rows.items()
+    else:
+        rows = [row for row in csv.reader(io.StringIO(text)) if row and any(cell.strip() for cell in row)]
+        if rows and not SUBJECT_CODE_RE.match(rows[0][0].strip().upper()):
+            rows = rows[1:]  # header
+
+    credits = {}
+    for row in rows:
+        code, value = (row[0], row[1]) if len(row) >= 2 else (row[0], None)
+        code = str(code).strip().upper()
+        if not SUBJECT_CODE_RE.match(code):
+            raise ValueError(f"'{code}' is not a subject code")
+        try:
+            credit = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Credits for {code} must be a number")
+        if credit < 0:
+            raise ValueError(f"Credits for {code} cannot be negative")
+        credits[code] = credit
+
+    if not credits:
+        raise ValueError("The credit table is empty")
+    return credits
+
+class CreditSchemes:
+    """
+    Subject -> credit tables stored by name, one JSON file per scheme under
+    a directory (the app keeps one directory per user).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, name):
+        if not SCHEME_NAME_RE.match(name) or name.startswith('.'):
+            raise ValueError("Scheme names may only use letters, digits, spaces, '.', '-' and '_'")
+        return os.path.join(self.directory, name + '.json')
+
+    def list(self):
+        """Returns [{'name', 'subjects'}] for every stored scheme, by name."""
+        if not os.path.isdir(self.directory):
+            return []
+        schemes = []
+        for filename in sorted(os.listdir(self.directory)):
+            name, ext = os.path.splitext(filename)
+            if ext != '.json':
+                continue
+            credits = self.get(name)
+            if credits is not None:
+                schemes.append({'name': name, 'subjects': len(credits)})
+        return schemes
+
+    def get(self, name):
+        """Returns the credit table of a scheme, or None if it does not exist."""
+        try:
+            with open(self._path(name), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, name, credits):
+        path = self._path(name)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(credits, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+
+    def delete(self, name):
+        try:
+            os.remove(self._path(name))
+            return True
+        except OSError:
+            return False
+
+def _lookup(categorical, mapping):
+    """Maps a categorical Series through a dict via its categories; unmapped values give NaN."""
+    import numpy as np
+    table = np.array([mapping.get(c, np.nan) for c in categorical.cat.categories], dtype=float)
+    codes = categorical.cat.codes.to_numpy()
+    return np.where(codes >= 0, table[codes], np.nan)
+
+def compute_sgpa(df, credits):
+    """
+    SGPA of every register number in a results DataFrame.
+
+    Only subjects in the credit table count; a subject with an unknown grade is
+    skipped rather than scored as zero. Failed subjects keep their credits
+    with zero points, as in the calculator.
+    Returns:
+        tuple: (DataFrame indexed by Register No with Dept, Year, Credits,
+                Points, SGPA, Failed, Rank and Dept Rank columns, sorted by
+                rank; list of subject codes in df missing from the credit table)
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = df.drop_duplicates(['Register No', 'Subject'])
+    subjects = df['Subject'].astype('category')
+    missing = sorted(set(map(str, subjects.unique())) - set(credits))
+
+    credit = _lookup(subjects, credits)
+    points = _lookup(df['Grade'].astype('category'), GRADE_POINTS)
+    counted = ~np.isnan(credit) & ~np.isnan(points)
+
+    # Per-student sums in one pass each, over the register number codes
+    students = df['Register No'].astype('category')
+    codes = students.cat.codes.to_numpy()
+    n = len(students.cat.categories)
+    total_credits = np.bincount(codes[counted], weights=credit[counted], minlength=n)
+    total_points = np.bincount(codes[counted], weights=(credit * points)[counted], minlength=n)
+    failed = np.bincount(codes[counted], weights=((points == 0) & (credit > 0))[counted], minlength=n)
+
+    # Row of each student's first appearance, for its dept and year
+    first_row = np.zeros(n, dtype=np.intp)
+    first_row[codes[::-1]] = np.arange(len(df))[::-1]
+
+    keep = total_credits > 0
+    rows = first_row[keep]
+    result = pd.DataFrame({
+        'Dept': df['Dept'].astype(str).to_numpy()[rows],
+        'Year': df['Year'].astype(str).to_numpy()[rows],
+        'Credits': total_credits[keep],
+        'Points': total_points[keep],
+        'SGPA': np.round(total_points[keep] / total_credits[keep], 2),
+        'Failed': failed[keep].astype(int),
+    }, index=pd.Index(np.asarray(students.cat.categories, dtype=str)[keep], name='Register No'))
+
+    result['Rank'] = result['SGPA'].rank(method='min', ascending=False).astype(int)
+    result['Dept Rank'] = result.groupby(['Dept', 'Year'])['SGPA'].rank(method='min', ascending=False).astype(int)
+    return result.sort_values(['Rank', 'Dept', 'Year'], kind='stable'), missing
+
+def sgpa_distribution(sgpa_df):
+    """
+    SGPA summary per Dept and Year: {dept: {year: {students, mean, median,
+    min, max, passed_all, bands}}}, where bands counts students per SGPA band.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if sgpa_df.empty:
+        return {}
+    edges = [-np.inf, *SGPA_BANDS, np.inf]
+    labels = [f"<{SGPA_BANDS[0]}"] + [f"{lo}-{lo + 1}" for lo in SGPA_BANDS]
+    bands = pd.cut(sgpa_df['SGPA'], edges, labels=labels, right=False)
+
+    keys = [sgpa_df['Dept'], sgpa_df['Year']]
+    summary = sgpa_df.groupby(keys, sort=True)['SGPA'].agg(['count', 'mean', 'median', 'min', 'max'])
+    passed_all = sgpa_df['Failed'].eq(0).groupby(keys).sum().to_dict()
+    band_counts = pd.crosstab(keys, bands).reindex(columns=labels, fill_value=0)
+    band_counts = dict(zip(band_counts.index, band_counts.to_numpy().tolist()))
+
+    distribution = {}
+    for (dept, year), row in summary.iterrows():
+        distribution.setdefault(dept, {})[year] = {
+            'students': int(row['count']),
+            'mean': round(float(row['mean']), 2),
+            'median': round(float(row['median']), 2),
+            'min': round(float(row['min']), 2),
+            'max': round(float(row['max']), 2),
+            'passed_all': int(passed_all[(dept, year)]),
+            'bands': dict(zip(labels, band_counts[(dept, year)])),
+        }
+    return distribution
@@ -0,0 +1,186 @@
+import os
+import re
+import shutil
+import threading
+import time
+
+from utils.locks import file_lock
+
+# user_{id}_analysis_<stamp>.xlsx, plus the .feather/.stats.json stored next to it
+ANALYSIS_FILE_RE = re.compile(r'^user_(\d+)_analysis_.+?(\.xlsx|\.feather|\.stats\.json)$')
+TEMP_FILE_RE = re.compile(r'^temp_\d+_.+\.pdf$')
+# Copies of the newest report made before downloads pointed at the entry itself
+LEGACY_LATEST_RE = re.compile(r'^latest_\d+\.xlsx$')
+# Page slices of a PDF streamed in parallel (pdf_processor.SLICE_DIR_PREFIX)
+SLICE_DIR_RE = re.compile(r'^\.slices_')
+
+class StorageManager:
+    """
+    Keeps the analyses in an upload folder within a per-user and a global
+    byte quota.
+
+    Only derived files are evicted: Excel reports whose results are also
+    stored in columnar form, which ensure_workbook() rebuilds on the next
+    download. They go least recently used first, using file mtimes as the
+    access clock (touch() marks a report as used). The stored results
+    themselves are never removed; a user whose results alone exceed the quota
+    is refused new uploads instead (see over_quota). The parse cache has its
+    own bound and is not counted here.
+    """
+
+    def __init__(self, directory, user_quota, global_quota, lock_path):
+        self.directory = directory
+        self.user_quota = user_quota
+        self.global_quota = global_quota
+        self.lock_path = lock_path
+        self._sweeper = None
+
+    def _scan(self):
+        """Returns {user_id: {'bytes': total, 'reports': [(last_used, size, path)]}} for the folder."""
+        usage = {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return usage
+        names = {entry.name for entry in entries}
+        for entry in entries:
+            match = ANALYSIS_FILE_RE.match(entry.name)
+            if not match:
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            user = usage.setdefault(int(match.group(1)), {'bytes': 0, 'reports': []})
+            user['bytes'] += st.st_size
+            stem = entry.name[:-len('.xlsx')]
+            if match.group(2) == '.xlsx' and stem + '.feather' in names and stem + '.stats.json' in names:
+                user['reports'].append((st.st_mtime, st.st_size, entry.path))
+        return usage
+
+    def usage(self, user_id=None):
+        """Bytes used by one user's analyses, or by every analysis when user_id is None."""
+        usage = self._scan()
+        if user_id is not None:
+            return usage.get(user_id, {'bytes': 0})['bytes']
+        return sum(user['bytes'] for user in usage.values())
+
+    def over_quota(self, user_id):
+        """True when the user's stored results alone, without any report, exceed the user quota."""
+        user = self._scan().get(user_id)
+        if not user or not self.user_quota:
+            return False
+        return user['bytes'] - sum(size for _, size, _ in user['reports']) > self.user_quota
+
+    def touch(self, path):
+        """Marks a report as recently used."""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def enforce(self, keep=None):
+        """
+        Evicts least recently used reports until every user is within the user
+        quota and the folder within the global quota. The report at keep (one
+        about to be served) is never evicted. Returns the bytes freed.
+        """
+        freed = 0
+        with file_lock(self.lock_path):
+            usage = self._scan()
+            evictable = []
+            for user in usage.values():
+                reports = sorted(report for report in user['reports'] if report[2] != keep)
+                while self.user_quota and user['bytes'] > self.user_quota and reports:
+                    _, size, path = reports.pop(0)
+                    if self._remove(path):
+                        user['bytes'] -= size
+                        freed += size
+                evictable.extend(reports)
+
+            total = sum(user['bytes'] for user in usage.values())
+            for _, size, path in sorted(evictable):
+                if not self.global_quota or total <= self.global_quota:
+                    break
+                if self._remove(path):
+                    total -= size
+                    freed += size
+        return freed
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def sweep(self, max_age, in_use=()):
+        """
+        Removes files left behind by crashed or interrupted work: received PDFs
+        and *.tmp partial writes older than max_age seconds, page slice
+        directories none of whose files changed in max_age seconds, and legacy
+        latest_ copies. Received PDFs in in_use (still queued or being parsed)
+        are kept however old. Returns the number of files and directories removed.
+        """
+        removed = 0
+        cutoff = time.time() - max_age
+        in_use = {os.path.abspath(path) for path in in_use}
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return 0
+        for entry in entries:
+            if SLICE_DIR_RE.match(entry.name) and entry.is_dir():
+                if self._last_modified(entry.path) < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+                continue
+            if not entry.is_file():
+                continue
+            stale = (TEMP_FILE_RE.match(entry.name) and os.path.abspath(entry.path) not in in_use) \
+                or entry.name.endswith('.tmp')
+            try:
+                if (LEGACY_LATEST_RE.match(entry.name) or (stale and entry.stat().st_mtime < cutoff)) \
+                        and self._remove(entry.path):
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    @staticmethod
+    def _last_modified(directory):
+        """Newest mtime of a directory and the files in it; workers append to them as they parse."""
+        newest = 0
+        try:
+            newest = os.stat(directory).st_mtime
+            entries = list(os.scandir(directory))
+        except OSError:
+            return newest
+        for entry in entries:
+            try:
+                newest = max(newest, entry.stat().st_mtime)
+            except OSError:
+                pass
+        return newest
+
+    def start_sweeper(self, interval, max_age, in_use=None):
+        """
+        Runs sweep() and enforce() every interval seconds on a daemon thread.
+        in_use is an optional callable returning the paths sweep() must keep.
+        """
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while True:
+                try:
+                    removed = self.sweep(max_age, in_use() if in_use else ())
+                    freed = self.enforce()
+                    if removed or freed:
+                        print(f"Storage sweep: removed {removed} stale file(s), evicted {freed / 1024 / 1024:.1f} MB of reports")
+                except Exception as e:
+                    print(f"Error sweeping {self.directory}: {e}")
+                time.sleep(interval)
+
+        self._sweeper = threading.Thread(target=run, name='storage-sweeper', daemon=True)
+        self._sweeper.start()
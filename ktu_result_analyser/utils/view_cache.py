@@ -0,0 +1,113 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+class ViewCache:
+    """
+    Least-recently-used cache of values derived from a stored analysis, such
+    as its stats and its rendered results page, bounded by max_bytes.
+
+    Entries are grouped by analysis (entry_id) so invalidate() can drop all of
+    an analysis at once. Keys should carry everything the value depends on
+    (stats file mtime, template version, user), so a stale value is simply
+    never looked up again. Cached objects are shared between requests and
+    must not be modified.
+
+    With a directory, byte values put with persist=True are also written
+    there, so other worker processes and restarts can reuse them. The disk
+    tier is bounded by max_disk_bytes, evicting by file mtime.
+    """
+
+    def __init__(self, max_bytes, directory=None, max_disk_bytes=0):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()  # (entry_id, key) -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _disk_path(self, entry_id, key):
+        return os.path.join(self.directory, f"{entry_id}.{hashlib.sha1(key.encode()).hexdigest()[:20]}")
+
+    def get(self, entry_id, key):
+        with self._lock:
+            item = self._entries.get((entry_id, key))
+            if item is not None:
+                self._entries.move_to_end((entry_id, key))
+                return item[0]
+        if not self.directory:
+            return None
+        path = self._disk_path(entry_id, key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        self._remember(entry_id, key, value, len(value))
+        return value
+
+    def put(self, entry_id, key, value, size, persist=False):
+        self._remember(entry_id, key, value, size)
+        if persist and self.directory:
+            path = self._disk_path(entry_id, key)
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(tmp, 'wb') as f:
+                    f.write(value)
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"Error writing view cache entry: {e}")
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                return
+            self._evict_disk()
+
+    def _remember(self, entry_id, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop((entry_id, key), None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[(entry_id, key)] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def _evict_disk(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def invalidate(self, entry_id):
+        """Drops everything cached for one analysis, in memory and on disk."""
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] == entry_id]:
+                self._bytes -= self._entries.pop(cache_key)[1]
+        if self.directory:
+            prefix = f"{entry_id}."
+            for name in os.listdir(self.directory):
+                if name.startswith(prefix):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
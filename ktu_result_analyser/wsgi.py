@@ -0,0 +1,19 @@
+"""
+WSGI entry point for running the app behind a production server, with
+several worker processes each serving requests on several threads:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Any WSGI server works (e.g. waitress-serve --port=8000 wsgi:app on
+Windows). Worker processes share the database, the upload folder and the
+job status files, so run them from the same directory.
+"""
+import os
+
+from app import app, init_db, start_metrics_sharing, start_storage_sweeper
+
+os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+with app.app_context():
+    init_db()
+start_storage_sweeper()
+start_metrics_sharing()